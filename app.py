@@ -2,29 +2,36 @@ from __future__ import annotations
 
 import time
 from pathlib import Path
+import altair as alt
 import streamlit as st
 import pandas as pd
 
 from fp.linkage import compute_linkage
 from fp.cluster import cut_clusters
+from fp.embedding import EMBEDDING_FILE, load_embedding_frame
 from fp.report import generate_report
-from fp.dendrogram import plot_dendrogram
+from fp.tree import dendrogram_frames, load_tree, tree_path
+
+# the segment map can exceed Altair's default 5,000-row limit
+alt.data_transformers.disable_max_rows()
 
 
 st.set_page_config(page_title="FP Clustering UI", layout="wide")
 
 st.title("Final Project — Clustering UI")
-st.caption("Pick columns → run linkage → dendrogram → cluster → report")
+st.caption("Pick columns → run linkage → cluster → report (dendrogram is interactive)")
 
 # ---- Inputs ---- PYTHONPATH=src streamlit run app.py
 features_csv = st.text_input("Features CSV path", value="artifacts/features.csv")
 
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns(4)
 with col1:
     max_rows = st.number_input("Max rows (speed)", min_value=1000, max_value=200000, value=40000, step=1000)
 with col2:
-    truncate_p = st.number_input("Dendrogram truncate p", min_value=10, max_value=200, value=50, step=5)
+    sample = st.selectbox("Sampling", ["reservoir", "head"], help="How max_rows users are picked")
 with col3:
+    truncate_p = st.number_input("Dendrogram truncate p", min_value=10, max_value=200, value=50, step=5)
+with col4:
     run_name = st.text_input("Run name (folder)", value=f"run_ui_{int(time.time())}")
 
 out_dir = Path("artifacts") / run_name
@@ -65,7 +72,6 @@ if run_button:
 
     linkage_path = out_dir / "linkage.npy"
     linkage_meta = out_dir / "linkage_meta.json"
-    dendro_path = out_dir / "dendrogram.png"
     report_path = out_dir / "report.md"
 
     with st.status("Running pipeline…", expanded=True) as status:
@@ -78,19 +84,10 @@ if run_button:
             method="ward",
             scale=True,
             max_rows=int(max_rows),
+            sample=sample,
         )
 
-        st.write("2) Saving dendrogram…")
-        plot_dendrogram(
-            features_csv=features_csv,
-            linkage_npy=str(linkage_path),
-            feature_cols=feature_cols,
-            out_png=str(dendro_path),
-            truncate_p=int(truncate_p),
-            max_rows=int(max_rows),
-        )
-
-        st.write("3) Cutting clusters…")
+        st.write("2) Cutting clusters…")
         cut_clusters(
             features_csv=features_csv,
             linkage_npy=str(linkage_path),
@@ -101,7 +98,7 @@ if run_button:
             max_rows=int(max_rows),
         )
 
-        st.write("4) Generating report…")
+        st.write("3) Generating report…")
         generate_report(run_dir=str(out_dir), out_path=str(report_path))
 
         status.update(label="✅ Done", state="complete", expanded=False)
@@ -112,13 +109,38 @@ if run_button:
 summary_csv = out_dir / "cluster_summary.csv"
 means_csv = out_dir / "cluster_means.csv"
 report_md = out_dir / "report.md"
+tree_npz = tree_path(out_dir / "linkage.npy")
 dendro_png = out_dir / "dendrogram.png"
+embedding_npz = out_dir / EMBEDDING_FILE
+
+
+@st.cache_data
+def _dendrogram_frames(path: str, mtime: float, p: int):
+    return dendrogram_frames(load_tree(path), p)
+
+
+@st.cache_data
+def _embedding_points(path: str, mtime: float, per_cluster: int):
+    return load_embedding_frame(path, per_cluster=per_cluster)
+
 
 left, right = st.columns([1, 1])
 
 with left:
     st.subheader("Dendrogram")
-    if dendro_png.exists():
+    if tree_npz.exists():
+        segments, nodes = _dendrogram_frames(str(tree_npz), tree_npz.stat().st_mtime, int(truncate_p))
+        profile_cols = [c for c in nodes.columns if c not in ("node", "x", "y")]
+        lines = alt.Chart(segments).mark_rule().encode(
+            x=alt.X("x:Q", axis=None), x2="x2:Q",
+            y=alt.Y("y:Q", title="Euclidean distance"), y2="y2:Q",
+        )
+        points = alt.Chart(nodes).mark_circle(size=60).encode(
+            x="x:Q", y="y:Q", size=alt.Size("size:Q", legend=None),
+            tooltip=[alt.Tooltip(c, format=",.2f") for c in profile_cols],
+        )
+        st.altair_chart((lines + points).interactive(), use_container_width=True)
+    elif dendro_png.exists():
         st.image(str(dendro_png), use_container_width=True)
     else:
         st.info("Run clustering to generate dendrogram.")
@@ -131,6 +153,26 @@ with right:
     else:
         st.info("Run clustering to generate cluster summary.")
 
+st.subheader("Segment map (PCA)")
+if embedding_npz.exists():
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        per_cluster = st.number_input("Points per cluster", min_value=100, max_value=20000, value=2000, step=100)
+        points = _embedding_points(str(embedding_npz), embedding_npz.stat().st_mtime, int(per_cluster))
+        pcs = [c for c in points.columns if c.startswith("PC")]
+        y_axis = st.selectbox("Vertical axis", pcs[1:], index=0) if len(pcs) > 1 else pcs[0]
+    with c2:
+        scatter = alt.Chart(points).mark_circle(size=12, opacity=0.6).encode(
+            x=alt.X(f"{pcs[0]}:Q"),
+            y=alt.Y(f"{y_axis}:Q"),
+            color=alt.Color("Cluster:N"),
+            tooltip=["User ID", "Cluster"],
+        )
+        st.altair_chart(scatter.interactive(), use_container_width=True)
+        st.caption(f"{len(points):,} users shown (at most {int(per_cluster):,} per cluster)")
+else:
+    st.info("Run clustering to generate the segment map.")
+
 st.subheader("Cluster Means")
 if means_csv.exists():
     means = pd.read_csv(means_csv)
@@ -0,0 +1,76 @@
+"""
+Per-command CLI startup benchmark based on `python -X importtime`.
+
+    PYTHONPATH=src python benchmarks/bench_import.py [--repeat 5]
+
+Each command is measured as `import fp.cli` plus the modules that command
+imports lazily. The best of --repeat runs is compared against its budget;
+the script exits non-zero when a command is over budget.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# command -> (modules imported by the command body, budget in ms)
+COMMANDS: Dict[str, Tuple[List[str], float]] = {
+    "--help": ([], 250.0),
+    "report": (["fp.report"], 900.0),
+    "serve": (["fp.serve"], 900.0),
+    "features": (["fp.features"], 1000.0),
+    "screen": (["fp.screen"], 1000.0),
+    "linkage": (["fp.linkage"], 1200.0),
+    "cluster": (["fp.cluster"], 1200.0),
+    "run": (["fp.zones"], 1200.0),
+    "validate-dtype": (["fp.validate"], 2000.0),
+    "save-run": (["fp.db"], 900.0),
+    "dendrogram": (["fp.dendrogram"], 1000.0),
+    "neighbors": (["fp.neighbors"], 2500.0),
+}
+
+
+def import_time_ms(modules: List[str]) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Total import time (sum of top-level cumulative times) and the top-level modules.
+    """
+    code = "; ".join(f"import {m}" for m in ["fp.cli"] + modules)
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    top: List[Tuple[float, str]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # direct imports of the -c code (one space after "|")
+            top.append((int(cumulative) / 1000.0, name.strip()))
+    return sum(t for t, _ in top), sorted(top, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    over = []
+    for command, (modules, budget) in COMMANDS.items():
+        runs = [import_time_ms(modules) for _ in range(args.repeat)]
+        total, top = min(runs, key=lambda r: r[0])
+        heaviest = ", ".join(f"{name} {t:.0f}ms" for t, name in top[:3])
+        status = "ok" if total <= budget else "OVER"
+        print(f"{command:<12} {total:8.1f} ms / {budget:6.0f} ms  {status:<4}  [{heaviest}]")
+        if total > budget:
+            over.append(command)
+
+    if over:
+        sys.exit(f"Over startup budget: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Neighbour index benchmark on synthetic users.
+
+    PYTHONPATH=src python benchmarks/bench_neighbors.py --n-users 1000000
+
+Reports build time, index size (pickled) and query throughput for batched
+top-k lookups, unrestricted and restricted to one cluster.
+"""
+from __future__ import annotations
+
+import argparse
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+
+from fp.neighbors import NeighborIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-users", type=int, default=1_000_000)
+    parser.add_argument("--n-features", type=int, default=7)
+    parser.add_argument("--n-clusters", type=int, default=8)
+    parser.add_argument("--n-seeds", type=int, default=10_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(scale=3.0, size=(args.n_clusters, args.n_features))
+    clusters = rng.integers(1, args.n_clusters + 1, size=args.n_users)
+    X = centers[clusters - 1] + rng.normal(size=(args.n_users, args.n_features))
+    user_ids = rng.permutation(args.n_users * 3)[: args.n_users].astype("int64")
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    idx = NeighborIndex(user_ids, clusters, X, [f"f{i}" for i in range(args.n_features)])
+    build_s = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size_mb = len(pickle.dumps(idx.tree, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+
+    seeds = rng.choice(user_ids, size=args.n_seeds, replace=False)
+    t0 = time.perf_counter()
+    idx.query(seeds, k=args.k)
+    query_s = time.perf_counter() - t0
+
+    idx.query(seeds[:1], k=args.k, cluster=1)  # builds the cluster tree once
+    t0 = time.perf_counter()
+    idx.query(seeds, k=args.k, cluster=1)
+    cluster_query_s = time.perf_counter() - t0
+
+    print(f"users={args.n_users:,} features={args.n_features} seeds={args.n_seeds:,} k={args.k}")
+    print(f"build: {build_s:.2f}s  peak alloc: {peak / 1e6:.0f} MB  pickled tree: {size_mb:.0f} MB")
+    print(f"query: {args.n_seeds / query_s:,.0f} seeds/s ({query_s:.2f}s)")
+    print(f"query (cluster=1): {args.n_seeds / cluster_query_s:,.0f} seeds/s ({cluster_query_s:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+
+
+def height_acceleration(Z: np.ndarray, ks: List[int]) -> Dict[int, float]:
+    """
+    Second difference of the merge heights around each k ("elbow" of the dendrogram).
+
+    With h[j] the height of the merge that leaves j + 1 clusters, the score of
+    k is h[k-2] - 2 h[k-1] + h[k]: large when the merge into k - 1 clusters
+    jumps much more than the merges below k.
+    """
+    h = np.asarray(Z[:, 2], dtype=np.float64)[::-1]
+    out = {}
+    for k in ks:
+        if 2 <= k and k < len(h):
+            out[k] = float(h[k - 2] - 2.0 * h[k - 1] + h[k])
+    return out
+
+
+def within_dispersion(X: np.ndarray, labels: np.ndarray) -> float:
+    """
+    Pooled within-cluster sum of squares: sum ||x||^2 - sum_c n_c ||mean_c||^2.
+    """
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    sums = np.add.reduceat(X[order], starts, axis=0)
+    counts = np.diff(np.r_[starts, len(labels)])
+    return float((X ** 2).sum() - ((sums ** 2).sum(axis=1) / counts).sum())
+
+
+def _log_dispersions(X: np.ndarray, ks: List[int], method: str) -> np.ndarray:
+    Z = linkage(X, method=method)
+    return np.array([np.log(max(within_dispersion(X, fcluster(Z, t=k, criterion="maxclust")), 1e-12)) for k in ks])
+
+
+def _reference_log_dispersions(args) -> np.ndarray:
+    lo, hi, n, ks, method, seed = args
+    rng = np.random.default_rng(seed)
+    return _log_dispersions(rng.uniform(lo, hi, size=(n, len(lo))), ks, method)
+
+
+def gap_statistic(
+    X: np.ndarray,
+    ks: List[int],
+    method: str = "ward",
+    n_refs: int = 10,
+    max_rows: int | None = 5000,
+    seed: int = 0,
+    n_jobs: Optional[int] = None,
+) -> Dict[int, dict]:
+    """
+    Gap statistic (Tibshirani et al.) for each k.
+
+    Reference datasets are uniform over X's bounding box and clustered with the
+    same linkage method in a process pool. Linkage is O(n^2), so X is first
+    subsampled to max_rows (references use the same size).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    if max_rows is not None and len(X) > max_rows:
+        X = X[np.sort(rng.choice(len(X), size=max_rows, replace=False))]
+
+    log_w = _log_dispersions(X, ks, method)
+
+    lo, hi = X.min(axis=0), X.max(axis=0)
+    seeds = np.random.SeedSequence(seed).spawn(n_refs)
+    jobs = [(lo, hi, len(X), ks, method, s) for s in seeds]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        ref = np.vstack(list(pool.map(_reference_log_dispersions, jobs)))
+
+    gap = ref.mean(axis=0) - log_w
+    sd = ref.std(axis=0) * np.sqrt(1.0 + 1.0 / n_refs)
+    return {k: {"gap": float(g), "gap_sd": float(s), "log_w": float(w)} for k, g, s, w in zip(ks, gap, sd, log_w)}
+
+
+def pick_gap_k(scores: Dict[int, dict]) -> int:
+    """
+    Smallest k with Gap(k) >= Gap(k+1) - s(k+1); the best gap if none qualifies.
+    """
+    ks = sorted(scores)
+    for k, k_next in zip(ks, ks[1:]):
+        if scores[k]["gap"] >= scores[k_next]["gap"] - scores[k_next]["gap_sd"]:
+            return k
+    return max(ks, key=lambda k: scores[k]["gap"])
+
+
+def recommend_cut(
+    Z: np.ndarray,
+    X: np.ndarray,
+    k_min: int = 2,
+    k_max: int = 15,
+    method: str = "ward",
+    n_refs: int = 10,
+    max_rows: int | None = 5000,
+    seed: int = 0,
+    n_jobs: Optional[int] = None,
+) -> dict:
+    """
+    Evaluate k_min..k_max by merge-height acceleration and by gap statistic.
+    The gap choice is recommended; acceleration is used when n_refs == 0.
+    """
+    n = Z.shape[0] + 1
+    ks = [k for k in range(max(2, k_min), k_max + 1) if k < n]
+    if not ks:
+        raise ValueError(f"No k to evaluate in [{k_min}, {k_max}] for {n} users")
+
+    accel = height_acceleration(Z, ks)
+    k_accel = max(accel, key=accel.get) if accel else ks[0]
+
+    gap = gap_statistic(X, ks, method=method, n_refs=n_refs, max_rows=max_rows, seed=seed, n_jobs=n_jobs) if n_refs > 0 else {}
+    k_gap = pick_gap_k(gap) if gap else None
+
+    scores = {}
+    for k in ks:
+        scores[str(k)] = {"acceleration": accel.get(k), **gap.get(k, {})}
+
+    return {
+        "k_min": ks[0],
+        "k_max": ks[-1],
+        "method": "gap" if k_gap is not None else "acceleration",
+        "gap_refs": n_refs,
+        "k_acceleration": int(k_accel),
+        "k_gap": None if k_gap is None else int(k_gap),
+        "chosen_k": int(k_gap if k_gap is not None else k_accel),
+        "scores": scores,
+    }
@@ -3,23 +3,24 @@ from __future__ import annotations
 import typer
 from typing import List, Optional
 
-from fp.features import build_features
-from fp.linkage import compute_linkage
-from fp.cluster import cut_clusters
-from fp.report import generate_report
-from fp.dendrogram import plot_dendrogram
+# Stage modules pull in pandas / scipy / scikit-learn / matplotlib, so each
+# command imports only what it uses; `fp --help` and `fp report` stay cheap.
 
 app = typer.Typer(help="Final Project CLI: features -> linkage -> cluster -> report")
+neighbors_app = typer.Typer(help="Similar-users (lookalike) index over a run's scaled features")
+app.add_typer(neighbors_app, name="neighbors")
 
 @app.command()
 def dendrogram(
-    features: str = typer.Option(..., help="Features CSV"),
     linkage: str = typer.Option(..., help="Linkage .npy"),
-    feature_cols: List[str] = typer.Option(..., help="Columns used for clustering"),
+    features: Optional[str] = typer.Option(None, help="Features CSV (unused, kept for compatibility)"),
+    feature_cols: Optional[List[str]] = typer.Option(None, help="Columns used for clustering (unused)"),
     out: str = typer.Option("artifacts/dendrogram.png", help="Output PNG"),
     truncate_p: int = typer.Option(50, help="How many clusters to show"),
     max_rows: int = typer.Option(40000, help="Max rows"),
 ):
+    from fp.dendrogram import plot_dendrogram
+
     plot_dendrogram(
         features_csv=features,
         linkage_npy=linkage,
@@ -31,7 +32,7 @@ def dendrogram(
 
 @app.command()
 def features(
-    orders: str = typer.Option(..., help="Orders CSV path or filename"),
+    orders: List[str] = typer.Option(..., help="Orders CSV path, filename or glob (repeatable; duplicate Order IDs are dropped)"),
     zones: str = typer.Option(..., help="Zones CSV path or filename"),
     tags: str = typer.Option(..., help="Provider tags CSV path or filename"),
     data_dir: str = typer.Option(
@@ -40,7 +41,12 @@ def features(
     ),
     out: str = typer.Option("artifacts/features.csv", help="Output features CSV"),
     min_orders: int = typer.Option(3, help="Minimum orders per user"),
+    reference_date: Optional[str] = typer.Option(None, help="Anchor date for recency features, inclusive of that whole day (default: latest order)"),
+    window: Optional[List[int]] = typer.Option(None, help="Recency window in days (repeatable; default 30, 90, 180)"),
+    workers: Optional[int] = typer.Option(None, help="Threads reading the orders files"),
 ):
+    from fp.features import RECENCY_WINDOWS_DAYS, build_features
+
     build_features(
         orders_path=orders,
         zones_path=zones,
@@ -48,20 +54,107 @@ def features(
         out_path=out,
         data_dir=data_dir,
         min_orders_per_user=min_orders,
+        reference_date=reference_date,
+        windows=window or RECENCY_WINDOWS_DAYS,
+        max_workers=workers,
     )
     typer.echo(f"✅ Wrote features to {out}")
 
 
+@app.command()
+def run(
+    orders: List[str] = typer.Option(..., help="Orders CSV path, filename or glob (repeatable; duplicate Order IDs are dropped)"),
+    zones: str = typer.Option(..., help="Zones CSV path or filename"),
+    tags: str = typer.Option(..., help="Provider tags CSV path or filename"),
+    feature_cols: List[str] = typer.Option(..., help="Columns to use for clustering"),
+    out_dir: str = typer.Option(..., help="Output directory (one sub-run per zone with --by-zone)"),
+    data_dir: Optional[str] = typer.Option(None, help="Directory where the CSVs live (used when you pass only filenames)"),
+    by_zone: bool = typer.Option(False, help="Segment each user's dominant zone separately, in parallel"),
+    cut_distance: Optional[float] = typer.Option(None, help="Cut distance (distance criterion)"),
+    n_clusters: Optional[int] = typer.Option(None, help="Number of clusters (maxclust criterion)"),
+    auto: bool = typer.Option(False, help="Pick the number of clusters automatically"),
+    max_rows: int = typer.Option(40000, help="Max rows for the global run (0 = all; zones use all users, with a kNN linkage above 40,000)"),
+    min_orders: int = typer.Option(3, help="Minimum orders per user"),
+    reference_date: Optional[str] = typer.Option(None, help="Anchor date for recency features, inclusive of that whole day (default: latest order)"),
+    workers: Optional[int] = typer.Option(None, help="Worker processes for --by-zone"),
+    dtype: str = typer.Option("float64", help="Float precision: float64 | float32"),
+):
+    from fp.zones import run_segmentation
+
+    index = run_segmentation(
+        orders_path=orders,
+        zones_path=zones,
+        tags_path=tags,
+        out_dir=out_dir,
+        feature_cols=feature_cols,
+        data_dir=data_dir,
+        by_zone=by_zone,
+        cut_distance=cut_distance,
+        n_clusters=n_clusters,
+        auto=auto,
+        max_rows=max_rows or None,
+        min_orders_per_user=min_orders,
+        reference_date=reference_date,
+        max_workers=workers,
+        dtype=dtype,
+    )
+    for _, row in index.iterrows():
+        typer.echo(f"{row['Zone']}: {row['Users']:,} users, {row['Clusters']} clusters ({row['Status']})")
+    typer.echo(f"✅ Wrote segmentation outputs to {out_dir}")
+
+
+@app.command()
+def screen(
+    features: str = typer.Option(..., help="Features CSV"),
+    out: str = typer.Option("artifacts/screen.json", help="Output screening JSON (for fp linkage --screen)"),
+    feature_cols: Optional[List[str]] = typer.Option(None, help="Columns to screen (default: all numeric)"),
+    threshold: float = typer.Option(0.9, help="|correlation| at which two columns count as collinear"),
+    constant_tol: float = typer.Option(1e-3, help="Near-constant when std <= tol * max(|mean|, 1)"),
+    chunksize: int = typer.Option(100_000, help="Rows per streamed block"),
+):
+    from fp.screen import screen_features
+
+    result = screen_features(
+        features_csv=features,
+        out_json=out,
+        columns=feature_cols or None,
+        corr_threshold=threshold,
+        constant_tol=constant_tol,
+        chunksize=chunksize,
+    )
+    for d in result["dropped"]:
+        why = f"|r|={abs(d['corr']):.2f} with {d['partner']}" if d["reason"] == "collinear" else "near-constant"
+        typer.echo(f"drop {d['column']}: {why}")
+    typer.echo(f"✅ Suggested {len(result['suggested_columns'])} of {len(result['columns'])} columns; wrote {out}")
+
+
 @app.command()
 def linkage(
     features: str = typer.Option(..., help="Features CSV"),
-    feature_cols: List[str] = typer.Option(..., help="Columns to use for clustering"),
+    feature_cols: Optional[List[str]] = typer.Option(None, help="Columns to use for clustering (optional with --screen)"),
+    screen: Optional[str] = typer.Option(None, help="fp screen JSON: its suggested columns, or --feature-cols minus the ones it dropped"),
     out: str = typer.Option("artifacts/linkage.npy", help="Output linkage .npy"),
     meta: str = typer.Option("artifacts/linkage_meta.json", help="Output metadata JSON"),
     method: str = typer.Option("ward", help="Linkage method"),
     no_scale: bool = typer.Option(False, help="Disable scaling"),
-    max_rows: int = typer.Option(40000, help="Max rows to use"),
+    max_rows: int = typer.Option(40000, help="Max rows to use (0 = all users)"),
+    sample: str = typer.Option("head", help="How to pick max_rows users: head | reservoir | stratified"),
+    seed: int = typer.Option(0, help="Sampling seed"),
+    stratify_col: Optional[str] = typer.Option(None, help="Column to stratify on (stratified sampling)"),
+    stratify_bins: Optional[List[float]] = typer.Option(None, help="Bin edges for a numeric stratify column"),
+    dtype: str = typer.Option("float64", help="Float precision: float64 | float32"),
+    knn: Optional[int] = typer.Option(None, help="Constrain Ward merges to a k-nearest-neighbour graph (sparse, scales to more rows)"),
 ):
+    from fp.linkage import compute_linkage
+
+    if screen:
+        from fp.screen import screened_columns
+
+        feature_cols = screened_columns(screen, feature_cols)
+        typer.echo(f"Using screened columns: {', '.join(feature_cols)}")
+    if not feature_cols:
+        raise typer.BadParameter("Provide --feature-cols or --screen")
+
     compute_linkage(
         features_csv=features,
         feature_cols=feature_cols,
@@ -69,7 +162,13 @@ def linkage(
         meta_json=meta,
         method=method,
         scale=not no_scale,
-        max_rows=max_rows,
+        max_rows=max_rows or None,
+        sample=sample,
+        seed=seed,
+        stratify_col=stratify_col,
+        stratify_bins=stratify_bins or None,
+        dtype=dtype,
+        knn=knn,
     )
     typer.echo(f"✅ Wrote linkage to {out} and meta to {meta}")
 
@@ -77,13 +176,35 @@ def linkage(
 @app.command()
 def cluster(
     features: str = typer.Option(..., help="Features CSV"),
-    linkage: str = typer.Option(..., help="Linkage .npy"),
     feature_cols: List[str] = typer.Option(..., help="Columns to use for clustering"),
     out_dir: str = typer.Option(..., help="Output run directory"),
+    linkage: Optional[str] = typer.Option(None, help="Linkage .npy to cut (scipy engine)"),
     cut_distance: Optional[float] = typer.Option(None, help="Cut distance (distance criterion)"),
     n_clusters: Optional[int] = typer.Option(None, help="Number of clusters (maxclust criterion)"),
-    max_rows: int = typer.Option(40000, help="Max rows to use"),
+    max_rows: int = typer.Option(40000, help="Max rows to use (0 = all users; the scipy engine then needs --linkage)"),
+    dtype: str = typer.Option("float64", help="Float precision: float64 | float32"),
+    engine: str = typer.Option("scipy", help="Clustering engine: scipy | minibatch-kmeans | birch"),
+    no_scale: bool = typer.Option(False, help="Disable scaling (engines other than a precomputed linkage)"),
+    sample: str = typer.Option("head", help="How to pick max_rows users without a linkage: head | reservoir | stratified"),
+    stratify_col: Optional[str] = typer.Option(None, help="Column to stratify on (stratified sampling)"),
+    stratify_bins: Optional[List[float]] = typer.Option(None, help="Bin edges for a numeric stratify column"),
+    seed: int = typer.Option(0, help="Sampling / engine seed"),
+    auto: bool = typer.Option(False, help="Pick the number of clusters automatically (scipy engine)"),
+    k_min: int = typer.Option(2, help="Smallest k evaluated by --auto"),
+    k_max: int = typer.Option(15, help="Largest k evaluated by --auto"),
+    gap_refs: int = typer.Option(10, help="Reference datasets for the gap statistic (0 = heights only)"),
+    jobs: Optional[int] = typer.Option(None, help="Worker processes for the gap statistic"),
+    exemplars: int = typer.Option(5, help="Exemplar users per cluster (cluster_exemplars.csv)"),
+    baseline: Optional[str] = typer.Option(None, help="Earlier run directory; write assignments_delta.npz against it"),
+    embedding_dims: int = typer.Option(3, help="PCA embedding dimensions for the segment map: 2 | 3 (0 = skip)"),
+    reference: Optional[str] = typer.Option(None, help="Earlier run directory whose cluster ids this run should keep"),
+    linkage_meta: Optional[str] = typer.Option(None, help="fp linkage --meta JSON of --linkage; --auto clusters gap references with its method"),
 ):
+    if embedding_dims not in (0, 2, 3):
+        raise typer.BadParameter("--embedding-dims must be 0 (off), 2 or 3")
+
+    from fp.cluster import cut_clusters
+
     cut_clusters(
         features_csv=features,
         linkage_npy=linkage,
@@ -91,20 +212,128 @@ def cluster(
         out_dir=out_dir,
         cut_distance=cut_distance,
         n_clusters=n_clusters,
-        max_rows=max_rows,
+        max_rows=max_rows or None,
+        dtype=dtype,
+        engine=engine,
+        scale=not no_scale,
+        sample=sample,
+        stratify_col=stratify_col,
+        stratify_bins=stratify_bins or None,
+        seed=seed,
+        auto=auto,
+        k_min=k_min,
+        k_max=k_max,
+        gap_refs=gap_refs,
+        n_jobs=jobs,
+        n_exemplars=exemplars,
+        baseline_dir=baseline,
+        embedding_dims=embedding_dims,
+        reference_dir=reference,
+        linkage_meta=linkage_meta,
     )
     typer.echo(f"✅ Wrote clustering outputs to {out_dir}")
 
 
+@app.command("validate-dtype")
+def validate_dtype(
+    features: str = typer.Option(..., help="Features CSV"),
+    feature_cols: List[str] = typer.Option(..., help="Columns to use for clustering"),
+    out: str = typer.Option("artifacts/dtype_validation.json", help="Output validation JSON"),
+    cut_distance: Optional[float] = typer.Option(None, help="Cut distance (distance criterion)"),
+    n_clusters: Optional[int] = typer.Option(None, help="Number of clusters (maxclust criterion)"),
+    method: str = typer.Option("ward", help="Linkage method"),
+    max_rows: int = typer.Option(40000, help="Max rows to use"),
+    sample: str = typer.Option("head", help="How to pick max_rows users: head | reservoir | stratified"),
+    stratify_col: Optional[str] = typer.Option(None, help="Column to stratify on (stratified sampling)"),
+    stratify_bins: Optional[List[float]] = typer.Option(None, help="Bin edges for a numeric stratify column"),
+    seed: int = typer.Option(0, help="Sampling seed"),
+):
+    from fp.validate import validate_float32
+
+    res = validate_float32(
+        features_csv=features,
+        feature_cols=feature_cols,
+        out_json=out,
+        cut_distance=cut_distance,
+        n_clusters=n_clusters,
+        method=method,
+        max_rows=max_rows,
+        sample=sample,
+        seed=seed,
+        stratify_col=stratify_col,
+        stratify_bins=stratify_bins or None,
+    )
+    typer.echo(f"ARI float32 vs float64: {res['adjusted_rand_index']:.4f} (agreement {res['matched_agreement']:.2%})")
+    typer.echo(f"✅ Wrote validation report to {out}")
+
+
+@app.command("save-run")
+def save_run(
+    run_dir: str = typer.Option(..., help="Run directory written by fp cluster"),
+    db: str = typer.Option("artifacts/fp.sqlite", help="SQLite database"),
+):
+    from fp.db import save_run_dir
+
+    run_id = save_run_dir(db, run_dir)
+    typer.echo(f"✅ Stored {run_dir} as run {run_id} in {db}")
+
+
 @app.command()
 def report(
     run_dir: str = typer.Option(..., help="Run output directory (contains cluster_summary.csv etc.)"),
     out: str = typer.Option(..., help="Output report path (.md)"),
 ):
+    from fp.report import generate_report
+
     generate_report(run_dir=run_dir, out_path=out)
     typer.echo(f"✅ Wrote report to {out}")
 
 
+@app.command()
+def serve(
+    run_dir: List[str] = typer.Option(..., help="Run directories to serve (repeatable; first is the default)"),
+    host: str = typer.Option("127.0.0.1", help="Bind address"),
+    port: int = typer.Option(8765, help="Port"),
+):
+    from fp.serve import serve as serve_runs
+
+    typer.echo(f"Serving {len(run_dir)} run(s) on http://{host}:{port}")
+    serve_runs(run_dirs=run_dir, host=host, port=port)
+
+
+@neighbors_app.command("build")
+def neighbors_build(
+    features: str = typer.Option(..., help="Features CSV"),
+    run_dir: str = typer.Option(..., help="Run output directory (from fp cluster)"),
+    leaf_size: int = typer.Option(40, help="KD-tree leaf size"),
+):
+    from fp.neighbors import build_neighbor_index
+
+    idx = build_neighbor_index(features_csv=features, run_dir=run_dir, leaf_size=leaf_size)
+    typer.echo(f"✅ Indexed {len(idx.user_ids):,} users in {run_dir}")
+
+
+@neighbors_app.command("query")
+def neighbors_query(
+    run_dir: str = typer.Option(..., help="Run output directory with neighbors.pkl"),
+    seed: Optional[List[int]] = typer.Option(None, help="Seed User ID (repeatable)"),
+    seeds_csv: Optional[str] = typer.Option(None, help="CSV with a 'User ID' column of seeds"),
+    k: int = typer.Option(10, help="Neighbours per seed"),
+    cluster: Optional[int] = typer.Option(None, help="Only return users from this cluster"),
+    out: str = typer.Option("artifacts/neighbors.csv", help="Output CSV"),
+):
+    from fp.io import read_csv
+    from fp.neighbors import query_neighbors
+
+    seeds = list(seed or [])
+    if seeds_csv:
+        seeds += read_csv(seeds_csv)["User ID"].astype(int).tolist()
+    if not seeds:
+        raise typer.BadParameter("Provide --seed or --seeds-csv")
+    res = query_neighbors(run_dir=run_dir, seed_user_ids=seeds, k=k, cluster=cluster, out_csv=out)
+    typer.echo(f"✅ Wrote {len(res):,} neighbours for {len(seeds):,} seeds to {out}")
+
+
 def main():
     app()
 
@@ -1,34 +1,120 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import List, Optional
 import numpy as np
 import pandas as pd
-from scipy.cluster.hierarchy import fcluster
+from scipy.cluster.hierarchy import linkage
 
-from fp.io import read_csv, write_csv, save_json
+from fp.autocut import recommend_cut
+from fp.delta import load_assignments, save_assignments, write_delta
+from fp.embedding import EMBEDDING_FILE, compute_embedding
+from fp.engines import make_engine
+from fp.exemplars import cluster_exemplars
+from fp.io import write_csv, save_json
+from fp.linkage import check_dtype, scale_features
+from fp.profiles import cluster_profiles, profile_means
+from fp.sampling import load_linkage_rows, sample_features, user_ids_path
+from fp.stable import relabel, stable_mapping
 
 
 def cut_clusters(
     features_csv: str,
-    linkage_npy: str,
+    linkage_npy: Optional[str],
     feature_cols: List[str],
     out_dir: str,
     cut_distance: Optional[float] = None,
     n_clusters: Optional[int] = None,
     max_rows: int | None = 40000,
+    dtype: str = "float64",
+    engine: str = "scipy",
+    scale: bool = True,
+    sample: str = "head",
+    seed: int = 0,
+    auto: bool = False,
+    k_min: int = 2,
+    k_max: int = 15,
+    gap_refs: int = 10,
+    n_jobs: Optional[int] = None,
+    n_exemplars: int = 5,
+    baseline_dir: Optional[str] = None,
+    embedding_dims: int = 3,
+    reference_dir: Optional[str] = None,
+    linkage_meta: Optional[str] = None,
+    stratify_col: Optional[str] = None,
+    stratify_bins: Optional[List[float]] = None,
 ) -> None:
-    if (cut_distance is None) == (n_clusters is None):
+    """
+    Assign every loaded user to a cluster and write the run outputs:
+    clustered_users.csv, cluster_summary.csv, cluster_means.csv, run_meta.json,
+    cluster_profiles.csv (count / mean / std / p10 / median / p90 / z per
+    cluster and feature, see fp.profiles) and cluster_exemplars.csv (users
+    nearest each centroid + a medoid).
+
+    engine="scipy" cuts the linkage at `linkage_npy` (rows aligned through its
+    saved User IDs) or, without a linkage, builds a full Ward linkage over at
+    most max_rows users (max_rows=None is refused there: O(n^2) memory); other
+    engines (minibatch-kmeans, birch) cluster the scaled features directly, so
+    max_rows=None is practical for them.
+
+    auto=True picks n_clusters in k_min..k_max from the hierarchy (merge-height
+    acceleration + gap statistic, see fp.autocut) and records the scores.
+    The gap references are clustered with the method of the cut linkage, read
+    from linkage_meta (the JSON written by compute_linkage; ward without it).
+    References are never kNN-constrained; run_meta.json notes it when the cut
+    linkage was.
+
+    Every run also writes assignments.npz (sorted user ids + clusters). With
+    baseline_dir, assignments_delta.npz lists only the users added, removed or
+    moved since that run (see fp.delta) and run_meta.json records the counts.
+
+    embedding_dims=2 or 3 also stores a randomized-PCA embedding of the scaled
+    features (embedding.npz, see fp.embedding) for the app's segment map.
+
+    reference_dir renumbers the clusters to match that run's ids (optimal
+    assignment on centroid distances, or member overlap when the feature
+    columns differ; see fp.stable), so "Cluster 3" keeps its meaning across
+    reruns. The mapping is stored in run_meta.json under stable_ids.
+    """
+    check_dtype(dtype)
+    if auto:
+        if cut_distance is not None or n_clusters is not None:
+            raise ValueError("auto picks the cut itself; do not pass cut_distance or n_clusters")
+        if engine != "scipy":
+            raise ValueError(f"auto cut needs the hierarchical scipy engine, not {engine!r}")
+    elif (cut_distance is None) == (n_clusters is None):
         raise ValueError("Provide exactly one: cut_distance OR n_clusters")
+    if embedding_dims not in (0, 2, 3):
+        raise ValueError(f"embedding_dims must be 0 (off), 2 or 3, got {embedding_dims}")
+    if engine == "scipy" and linkage_npy is None and not max_rows:
+        raise ValueError(
+            "Refusing to build a full Ward linkage over every user (O(n^2) memory); set max_rows, "
+            "pass a linkage from `fp linkage` (--knn scales to all users) or use a flat engine"
+        )
 
     out_path = Path(out_dir)
     out_path.mkdir(parents=True, exist_ok=True)
-
-    df = read_csv(features_csv)
-    if max_rows is not None:
-        df = df.iloc[:max_rows].copy()
+    # read before this run can overwrite it (baseline_dir may be out_dir)
+    baseline = load_assignments(baseline_dir) if baseline_dir is not None else None
 
     needed = ["User ID"] + feature_cols
+    if linkage_npy is not None:
+        if engine != "scipy":
+            raise ValueError(f"A linkage matrix can only be cut by the scipy engine, not {engine!r}")
+        df = load_linkage_rows(features_csv, needed, linkage_npy, max_rows, dtype=dtype)
+    else:
+        df = sample_features(
+            features_csv,
+            needed,
+            max_rows,
+            mode=sample,
+            seed=seed,
+            stratify_col=stratify_col,
+            stratify_bins=stratify_bins,
+            dtype=dtype,
+        )
+
     missing = [c for c in needed if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns in features: {missing}")
@@ -36,13 +122,49 @@ def cut_clusters(
     labels = df["User ID"].astype(int).tolist()
     X = df[feature_cols].fillna(0.0)
 
-    Z = np.load(linkage_npy)
+    engine_params = {"n_clusters": n_clusters, "cut_distance": cut_distance, "seed": seed}
+    ids_npy = None
+    if linkage_npy is not None:
+        # fcluster works on float64; float32 linkages are upcast here (n x 4, cheap)
+        Z = np.load(linkage_npy).astype(np.float64, copy=False)
+        ids_npy = user_ids_path(linkage_npy)
+        if Z.shape[0] + 1 != len(df):
+            raise ValueError(f"Linkage has {Z.shape[0] + 1} rows but {len(df)} feature rows were loaded")
+        engine_params["Z"] = Z
+
+    Xs = scale_features(X, scale=scale, dtype=dtype)
+
+    link = json.loads(Path(linkage_meta).read_text(encoding="utf-8")) if linkage_meta else {}
+    auto_cut = None
+    if auto:
+        method, knn = link.get("method", "ward"), link.get("knn")
+        if "Z" not in engine_params:
+            engine_params["Z"] = linkage(Xs, method=method)
+        auto_cut = recommend_cut(
+            engine_params["Z"], Xs, k_min=k_min, k_max=k_max, method=method, n_refs=gap_refs, seed=seed, n_jobs=n_jobs
+        )
+        auto_cut["reference_method"] = method
+        if linkage_npy is not None and not linkage_meta:
+            auto_cut["note"] = "no linkage_meta given; gap references assume the linkage used ward"
+        elif knn is not None:
+            auto_cut["note"] = f"the cut linkage is kNN-constrained (knn={knn}); gap references use unconstrained {method}"
+        n_clusters = auto_cut["chosen_k"]
+        engine_params["n_clusters"] = n_clusters
+
+    model = make_engine(engine, **engine_params).fit(Xs)
+    clusters, cluster_ids, centroids = model.labels_, model.cluster_ids_, model.centroids_
+
+    stable_ids = None
+    if reference_dir is not None:
+        stable_ids = stable_mapping(reference_dir, feature_cols, np.asarray(labels, dtype=np.int64), clusters, X)
+        clusters = relabel(clusters, stable_ids["mapping"])
+        cluster_ids = relabel(cluster_ids, stable_ids["mapping"])
+        by_id = np.argsort(cluster_ids)
+        cluster_ids, centroids = cluster_ids[by_id], centroids[by_id]
 
     if cut_distance is not None:
-        clusters = fcluster(Z, t=float(cut_distance), criterion="distance")
         params = {"criterion": "distance", "cut_distance": float(cut_distance)}
     else:
-        clusters = fcluster(Z, t=int(n_clusters), criterion="maxclust")
         params = {"criterion": "maxclust", "n_clusters": int(n_clusters)}
 
     clustered_users = pd.DataFrame({"User ID": labels, "Cluster": clusters})
@@ -52,13 +174,33 @@ def cut_clusters(
     pct = clustered_users["Cluster"].value_counts(normalize=True).rename("Percentage") * 100.0
     summary = pd.DataFrame({"Cluster": counts.index, "Count": counts.values, "Percentage": pct.values})
 
-    # merged for means
-    merged = df[needed].merge(clustered_users, on="User ID", how="inner")
-    means = merged.groupby("Cluster")[feature_cols].mean().reset_index()
+    # X stays in the run's dtype; the profiler upcasts one chunk at a time
+    profiles = cluster_profiles(X.to_numpy(dtype=dtype), clusters, feature_cols, dtype=dtype)
 
     write_csv(clustered_users, out_path / "clustered_users.csv")
     write_csv(summary, out_path / "cluster_summary.csv")
-    write_csv(means, out_path / "cluster_means.csv")
+    write_csv(profile_means(profiles), out_path / "cluster_means.csv")
+    write_csv(profiles, out_path / "cluster_profiles.csv")
+
+    save_assignments(out_path, np.asarray(labels, dtype=np.int64), clusters)
+    delta = write_delta(out_path, baseline_dir, baseline) if baseline is not None else None
+
+    exemplars = cluster_exemplars(
+        Xs,
+        np.asarray(labels, dtype=np.int64),
+        clusters,
+        cluster_ids,
+        centroids,
+        top_n=n_exemplars,
+        seed=seed,
+    )
+    write_csv(exemplars, out_path / "cluster_exemplars.csv")
+
+    embedding = None
+    if embedding_dims:
+        embedding = compute_embedding(
+            Xs, np.asarray(labels, dtype=np.int64), clusters, out_path / EMBEDDING_FILE, n_components=embedding_dims, seed=seed
+        )
 
     save_json(
         {
@@ -66,8 +208,24 @@ def cut_clusters(
             "linkage_npy": linkage_npy,
             "feature_cols": feature_cols,
             **params,
+            "engine": model.params(),
             "max_rows": max_rows,
+            "sample": None if linkage_npy is not None else sample,
+            **({"stratify_col": stratify_col, "stratify_bins": stratify_bins} if sample == "stratified" and linkage_npy is None else {}),
+            "dtype": dtype,
+            "user_ids_npy": str(ids_npy) if ids_npy is not None and ids_npy.exists() else None,
             "n_users": len(labels),
+            **({"auto": auto_cut} if auto_cut is not None else {}),
+            **({"delta": delta} if delta is not None else {}),
+            **({"embedding": embedding} if embedding is not None else {}),
+            **({"stable_ids": stable_ids} if stable_ids is not None else {}),
+            # Whether the clustering space was standardised (a cut linkage's own setting when known)
+            "scaled": bool(link.get("scale", scale)) if linkage_npy is not None else scale,
+            # Standardisation of this run's users, so centroids can be compared in scaled space
+            "scaler": {
+                "mean": X.mean(axis=0).tolist(),
+                "scale": X.std(axis=0, ddof=0).replace(0.0, 1.0).tolist(),
+            },
         },
         out_path / "run_meta.json",
     )
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import sqlite3
+from datetime import datetime
 from pathlib import Path
 import pandas as pd
 
@@ -55,9 +56,25 @@ def save_features(db_path: str, run_id: int, features_df: pd.DataFrame) -> None:
 
 
 def save_clusters(db_path: str, run_id: int, clustered_users_df: pd.DataFrame) -> None:
+    rows = zip(
+        [run_id] * len(clustered_users_df),
+        clustered_users_df["User ID"].astype(int).tolist(),
+        clustered_users_df["Cluster"].astype(int).tolist(),
+    )
     with sqlite3.connect(db_path) as con:
-        for _, row in clustered_users_df.iterrows():
-            con.execute(
-                "INSERT INTO clusters(run_id, user_id, cluster_id) VALUES (?, ?, ?)",
-                (run_id, int(row["User ID"]), int(row["Cluster"])),
-            )
+        con.executemany("INSERT INTO clusters(run_id, user_id, cluster_id) VALUES (?, ?, ?)", rows)
+
+
+def save_run_dir(db_path: str, run_dir: str, created_at: str | None = None) -> int:
+    """
+    Store a `fp cluster` run directory: run_meta.json as the run params
+    (including the stable_ids mapping) and clustered_users.csv, whose cluster
+    ids are already the stable ones when the run used a reference.
+    """
+    run = Path(run_dir)
+    params = json.loads((run / "run_meta.json").read_text(encoding="utf-8"))
+    params["run_dir"] = str(run)
+    init_db(db_path)
+    run_id = save_run(db_path, created_at or datetime.now().isoformat(timespec="seconds"), params)
+    save_clusters(db_path, run_id, pd.read_csv(run / "clustered_users.csv", usecols=["User ID", "Cluster"]))
+    return run_id
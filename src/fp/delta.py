@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+
+ASSIGNMENTS_FILE = "assignments.npz"
+DELTA_FILE = "assignments_delta.npz"
+
+# old/new cluster of a user missing from that side of the delta
+ABSENT = -1
+
+
+def save_assignments(run_dir: str | Path, user_ids: np.ndarray, clusters: np.ndarray) -> Path:
+    """
+    <run_dir>/assignments.npz: user ids (int64, sorted) and their clusters (int32).
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    order = np.argsort(user_ids, kind="stable")
+    path = Path(run_dir) / ASSIGNMENTS_FILE
+    np.savez_compressed(path, user_ids=user_ids[order], clusters=np.asarray(clusters, dtype=np.int32)[order])
+    return path
+
+
+def load_assignments(run_dir: str | Path) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (sorted user ids, clusters) of a run; runs written before assignments.npz
+    existed are read from clustered_users.csv.
+    """
+    run = Path(run_dir)
+    if (run / ASSIGNMENTS_FILE).exists():
+        with np.load(run / ASSIGNMENTS_FILE) as data:
+            return data["user_ids"], data["clusters"]
+    users = pd.read_csv(run / "clustered_users.csv", usecols=["User ID", "Cluster"])
+    ids = users["User ID"].to_numpy(dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+    return ids[order], users["Cluster"].to_numpy(dtype=np.int32)[order]
+
+
+def diff_assignments(
+    old_ids: np.ndarray,
+    old_clusters: np.ndarray,
+    new_ids: np.ndarray,
+    new_clusters: np.ndarray,
+) -> dict:
+    """
+    Users added, removed or moved between two sorted assignments.
+
+    Merge join: the two sorted id arrays are concatenated and stable-sorted
+    (timsort merges the two runs in linear time); equal neighbours are users
+    present in both. Returns arrays user_ids / old / new (ABSENT when missing
+    on that side) for changed users only, plus counts.
+    """
+    ids = np.concatenate([old_ids, new_ids])
+    clusters = np.concatenate([old_clusters, new_clusters]).astype(np.int32)
+    from_new = np.r_[np.zeros(len(old_ids), dtype=bool), np.ones(len(new_ids), dtype=bool)]
+    order = np.argsort(ids, kind="stable")
+    ids, clusters, from_new = ids[order], clusters[order], from_new[order]
+
+    # stable order puts the old row of a shared id right before the new one
+    pair = np.r_[ids[1:] == ids[:-1], False]
+    second = np.r_[False, pair[:-1]]
+    single = ~pair & ~second
+
+    both_ids = ids[pair]
+    both_old, both_new = clusters[pair], clusters[np.flatnonzero(pair) + 1]
+    moved = both_old != both_new
+
+    added = single & from_new
+    removed = single & ~from_new
+
+    out_ids = np.concatenate([both_ids[moved], ids[added], ids[removed]])
+    old = np.concatenate([both_old[moved], np.full(added.sum(), ABSENT), clusters[removed]]).astype(np.int32)
+    new = np.concatenate([both_new[moved], clusters[added], np.full(removed.sum(), ABSENT)]).astype(np.int32)
+    order = np.argsort(out_ids, kind="stable")
+    return {
+        "user_ids": out_ids[order],
+        "old": old[order],
+        "new": new[order],
+        "added": int(added.sum()),
+        "removed": int(removed.sum()),
+        "changed": int(moved.sum()),
+        "unchanged": int((~moved).sum()),
+    }
+
+
+def write_delta(run_dir: str | Path, baseline_dir: str | Path, baseline: Tuple[np.ndarray, np.ndarray] | None = None) -> dict:
+    """
+    Diff this run's assignments against baseline_dir's and write
+    <run_dir>/assignments_delta.npz. Returns the counts (for run_meta.json).
+    Pass `baseline` when it was loaded before run_dir could overwrite it.
+    """
+    if baseline is None:
+        baseline = load_assignments(baseline_dir)
+    delta = diff_assignments(*baseline, *load_assignments(run_dir))
+    np.savez_compressed(
+        Path(run_dir) / DELTA_FILE,
+        user_ids=delta["user_ids"],
+        old=delta["old"],
+        new=delta["new"],
+    )
+    return {
+        "baseline": str(baseline_dir),
+        "delta_npz": str(Path(run_dir) / DELTA_FILE),
+        **{k: delta[k] for k in ("added", "removed", "changed", "unchanged")},
+    }
+
+
+def load_delta(run_dir: str | Path) -> pd.DataFrame:
+    """
+    assignments_delta.npz as a frame: User ID, Old Cluster, New Cluster, Change.
+    """
+    with np.load(Path(run_dir) / DELTA_FILE) as data:
+        old, new = data["old"], data["new"]
+        change = np.where(old == ABSENT, "added", np.where(new == ABSENT, "removed", "changed"))
+        return pd.DataFrame({"User ID": data["user_ids"], "Old Cluster": old, "New Cluster": new, "Change": change})
@@ -3,31 +3,27 @@ from __future__ import annotations
 from pathlib import Path
 from typing import List, Optional
 import numpy as np
-import matplotlib.pyplot as plt
 from scipy.cluster.hierarchy import dendrogram
 
-from fp.io import read_csv
-
 
 def plot_dendrogram(
-    features_csv: str,
+    features_csv: Optional[str],
     linkage_npy: str,
-    feature_cols: List[str],
+    feature_cols: Optional[List[str]] = None,
     out_png: Optional[str] = None,
     truncate_p: int = 50,
     max_rows: int | None = 40000,
 ) -> str | None:
-    df = read_csv(features_csv)
-
-    if max_rows is not None:
-        df = df.iloc[:max_rows].copy()
+    # features_csv / feature_cols / max_rows are accepted for backwards compatibility;
+    # the plot only needs the linkage matrix.
+    # float32 linkages are stored as such; scipy only plots doubles
+    Z = np.load(linkage_npy).astype(np.float64, copy=False)
 
-    needed = ["User ID"] + feature_cols
-    missing = [c for c in needed if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-
-    Z = np.load(linkage_npy)
+    # matplotlib is only loaded here; files are rendered with the non-interactive Agg backend
+    import matplotlib
+    if out_png:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
     plt.figure(figsize=(12, 7))
     dendrogram(
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+
+EMBEDDING_FILE = "embedding.npz"
+
+
+def randomized_pca(
+    X: np.ndarray,
+    n_components: int,
+    n_oversamples: int = 10,
+    n_iter: int = 4,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Top principal axes of X by randomized SVD (Halko et al.): a Gaussian sketch
+    of the range, a few QR-stabilised power iterations, then an exact SVD of
+    the small projected matrix. Returns (mean, components [k x d], explained
+    variance ratio).
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, d = X.shape
+    k = min(n_components, d, n)
+    mean = X.mean(axis=0)
+    Xc = X - mean
+
+    rng = np.random.default_rng(seed)
+    Q = Xc @ rng.standard_normal((d, min(k + n_oversamples, d)))
+    Q, _ = np.linalg.qr(Q)
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(Xc.T @ Q)
+        Q, _ = np.linalg.qr(Xc @ Q)
+    _, s, vt = np.linalg.svd(Q.T @ Xc, full_matrices=False)
+
+    total = (Xc ** 2).sum()
+    ratio = (s[:k] ** 2) / total if total > 0 else np.zeros(k)
+    return mean, vt[:k], ratio
+
+
+def sample_per_cluster(clusters: np.ndarray, cap: int, seed: int = 0) -> np.ndarray:
+    """
+    Row indices with at most `cap` random rows per cluster (one sort on
+    (cluster, random key)), for plotting large runs.
+    """
+    clusters = np.asarray(clusters)
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(clusters)), clusters))
+    sorted_cl = clusters[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cl[1:] != sorted_cl[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return np.sort(order[rank < cap])
+
+
+def compute_embedding(
+    Xs: np.ndarray,
+    user_ids: np.ndarray,
+    clusters: np.ndarray,
+    out_npz: str | Path,
+    n_components: int = 3,
+    fit_rows: int = 50_000,
+    batch_size: int = 100_000,
+    seed: int = 0,
+) -> dict:
+    """
+    Fit randomized PCA on up to fit_rows random users of the scaled features,
+    project every user in batches and save <run>/embedding.npz (user ids,
+    clusters, float32 coordinates, axes). Returns the metadata for run_meta.json.
+    """
+    n = len(Xs)
+    rng = np.random.default_rng(seed)
+    fit_idx = np.sort(rng.choice(n, size=fit_rows, replace=False)) if n > fit_rows else slice(None)
+    mean, components, ratio = randomized_pca(Xs[fit_idx], n_components, seed=seed)
+
+    coords = np.empty((n, len(components)), dtype=np.float32)
+    for start in range(0, n, batch_size):
+        batch = np.asarray(Xs[start:start + batch_size], dtype=np.float64)
+        coords[start:start + batch_size] = (batch - mean) @ components.T
+
+    np.savez_compressed(
+        out_npz,
+        user_ids=np.asarray(user_ids, dtype=np.int64),
+        clusters=np.asarray(clusters, dtype=np.int32),
+        coords=coords,
+        components=components,
+        mean=mean,
+        explained_variance_ratio=ratio,
+    )
+    return {
+        "embedding_npz": str(out_npz),
+        "n_components": int(len(components)),
+        "fit_rows": int(min(n, fit_rows)),
+        "explained_variance_ratio": [float(r) for r in ratio],
+    }
+
+
+def load_embedding_frame(path: str | Path, per_cluster: int | None = None, seed: int = 0) -> pd.DataFrame:
+    """
+    embedding.npz as User ID / Cluster / PC1..PCk, optionally downsampled to
+    per_cluster users per cluster.
+    """
+    with np.load(path) as data:
+        clusters = data["clusters"]
+        idx = sample_per_cluster(clusters, per_cluster, seed=seed) if per_cluster else np.arange(len(clusters))
+        coords = data["coords"][idx]
+        frame = pd.DataFrame({"User ID": data["user_ids"][idx], "Cluster": clusters[idx]})
+    for j in range(coords.shape[1]):
+        frame[f"PC{j + 1}"] = coords[:, j]
+    return frame
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Type
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+
+
+def cluster_centroids(X: np.ndarray, labels: np.ndarray) -> tuple:
+    """
+    (cluster ids, centroid matrix) of X grouped by labels, one sort + reduceat.
+    """
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    sums = np.add.reduceat(np.asarray(X, dtype=np.float64)[order], starts, axis=0)
+    counts = np.diff(np.r_[starts, len(labels)])
+    return sorted_labels[starts], sums / counts[:, None]
+
+
+class ClusteringEngine(ABC):
+    """
+    Common interface of the clustering engines used by cut_clusters.
+
+    fit(X) takes the (scaled) feature matrix and sets:
+    - labels_: int cluster per row, numbered from 1 like fcluster
+    - cluster_ids_ / centroids_: cluster ids and their centroids in X's space
+    - linkage_: scipy linkage matrix when the engine builds a hierarchy, else None
+    """
+
+    name = ""
+    hierarchical = False
+
+    def __init__(self, n_clusters: Optional[int] = None, cut_distance: Optional[float] = None, seed: int = 0):
+        self.n_clusters = n_clusters
+        self.cut_distance = cut_distance
+        self.seed = seed
+        self.labels_: Optional[np.ndarray] = None
+        self.cluster_ids_: Optional[np.ndarray] = None
+        self.centroids_: Optional[np.ndarray] = None
+        self.linkage_: Optional[np.ndarray] = None
+
+    @abstractmethod
+    def _fit_labels(self, X: np.ndarray) -> np.ndarray:
+        """
+        Cluster label per row of X (numbered from 1).
+        """
+
+    def fit(self, X: np.ndarray) -> "ClusteringEngine":
+        self.labels_ = np.asarray(self._fit_labels(X), dtype=np.int64)
+        self.cluster_ids_, self.centroids_ = cluster_centroids(X, self.labels_)
+        return self
+
+    def params(self) -> dict:
+        return {"engine": self.name, "n_clusters": self.n_clusters, "cut_distance": self.cut_distance, "seed": self.seed}
+
+    def _require_n_clusters(self) -> int:
+        if self.n_clusters is None or self.cut_distance is not None:
+            raise ValueError(f"Engine {self.name!r} needs n_clusters (cut_distance is only for hierarchical engines)")
+        return int(self.n_clusters)
+
+
+class ScipyHierarchicalEngine(ClusteringEngine):
+    """
+    scipy linkage + fcluster. Pass a precomputed linkage `Z` to only cut it.
+    """
+
+    name = "scipy"
+    hierarchical = True
+
+    def __init__(self, n_clusters=None, cut_distance=None, seed=0, method: str = "ward", Z: Optional[np.ndarray] = None):
+        super().__init__(n_clusters=n_clusters, cut_distance=cut_distance, seed=seed)
+        if (cut_distance is None) == (n_clusters is None):
+            raise ValueError("Provide exactly one: cut_distance OR n_clusters")
+        self.method = method
+        self.Z = Z
+
+    def _fit_labels(self, X):
+        Z = self.Z if self.Z is not None else linkage(X, method=self.method)
+        self.linkage_ = np.asarray(Z, dtype=np.float64)
+        if self.cut_distance is not None:
+            return fcluster(self.linkage_, t=float(self.cut_distance), criterion="distance")
+        return fcluster(self.linkage_, t=int(self.n_clusters), criterion="maxclust")
+
+    def params(self):
+        return {**super().params(), "method": self.method}
+
+
+class MiniBatchKMeansEngine(ClusteringEngine):
+    """
+    scikit-learn MiniBatchKMeans: linear time, flat clusters.
+    """
+
+    name = "minibatch-kmeans"
+
+    def __init__(self, n_clusters=None, cut_distance=None, seed=0, batch_size: int = 4096, n_init: int = 3):
+        super().__init__(n_clusters=n_clusters, cut_distance=cut_distance, seed=seed)
+        self.batch_size = batch_size
+        self.n_init = n_init
+
+    def _fit_labels(self, X):
+        from sklearn.cluster import MiniBatchKMeans
+
+        model = MiniBatchKMeans(
+            n_clusters=self._require_n_clusters(),
+            batch_size=self.batch_size,
+            n_init=self.n_init,
+            random_state=self.seed,
+        )
+        return model.fit_predict(X) + 1
+
+    def params(self):
+        return {**super().params(), "batch_size": self.batch_size, "n_init": self.n_init}
+
+
+class BirchEngine(ClusteringEngine):
+    """
+    scikit-learn BIRCH: one pass into a CF-tree, then a global step to n_clusters.
+    """
+
+    name = "birch"
+
+    def __init__(self, n_clusters=None, cut_distance=None, seed=0, threshold: float = 0.5, branching_factor: int = 50):
+        super().__init__(n_clusters=n_clusters, cut_distance=cut_distance, seed=seed)
+        self.threshold = threshold
+        self.branching_factor = branching_factor
+
+    def _fit_labels(self, X):
+        from sklearn.cluster import Birch
+
+        model = Birch(
+            n_clusters=self._require_n_clusters(),
+            threshold=self.threshold,
+            branching_factor=self.branching_factor,
+        )
+        return model.fit_predict(X) + 1
+
+    def params(self):
+        return {**super().params(), "threshold": self.threshold, "branching_factor": self.branching_factor}
+
+
+ENGINES: Dict[str, Type[ClusteringEngine]] = {
+    ScipyHierarchicalEngine.name: ScipyHierarchicalEngine,
+    MiniBatchKMeansEngine.name: MiniBatchKMeansEngine,
+    BirchEngine.name: BirchEngine,
+}
+
+
+def make_engine(name: str, **params) -> ClusteringEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name!r} (expected one of {list(ENGINES)})")
+    return ENGINES[name](**params)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _sum_distances(candidates: np.ndarray, reference: np.ndarray, block: int) -> np.ndarray:
+    """
+    Sum of Euclidean distances from each candidate to all reference rows, in blocks
+    so at most block x len(reference) distances are held at once.
+    """
+    ref_sq = (reference ** 2).sum(axis=1)
+    out = np.empty(len(candidates))
+    for start in range(0, len(candidates), block):
+        c = candidates[start:start + block]
+        d2 = (c ** 2).sum(axis=1)[:, None] + ref_sq[None, :] - 2.0 * c @ reference.T
+        out[start:start + block] = np.sqrt(np.maximum(d2, 0.0)).sum(axis=1)
+    return out
+
+
+def cluster_exemplars(
+    Xs: np.ndarray,
+    user_ids: np.ndarray,
+    labels: np.ndarray,
+    cluster_ids: np.ndarray,
+    centroids: np.ndarray,
+    top_n: int = 5,
+    medoid_sample: int = 2000,
+    medoid_candidates: int = 200,
+    block: int = 512,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Top-N users closest to each centroid (scaled space) plus a medoid per cluster.
+
+    Clusters up to `medoid_sample` users get an exact medoid. Larger clusters
+    pick it among the `medoid_candidates` users nearest the centroid, scored
+    against a random sample of `medoid_sample` members.
+    """
+    Xs = np.asarray(Xs, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.searchsorted(sorted_labels, cluster_ids, side="left")
+    ends = np.searchsorted(sorted_labels, cluster_ids, side="right")
+
+    rows = []
+    for cl, centroid, lo, hi in zip(cluster_ids, centroids, starts, ends):
+        members = order[lo:hi]
+        Xm = Xs[members]
+        dist = np.sqrt(((Xm - centroid) ** 2).sum(axis=1))
+
+        n_top = min(top_n, len(members))
+        top = np.argpartition(dist, n_top - 1)[:n_top]
+        top = top[np.argsort(dist[top], kind="stable")]
+
+        exact = len(members) <= medoid_sample
+        if exact:
+            candidates, reference = np.arange(len(members)), Xm
+        else:
+            n_cand = min(medoid_candidates, len(members))
+            candidates = np.argpartition(dist, n_cand - 1)[:n_cand]
+            reference = Xm[rng.choice(len(members), size=medoid_sample, replace=False)]
+        medoid = candidates[np.argmin(_sum_distances(Xm[candidates], reference, block))]
+
+        rows.append({
+            "Cluster": int(cl),
+            "Role": "medoid" if exact else "medoid (sampled)",
+            "Rank": 1,
+            "User ID": int(user_ids[members[medoid]]),
+            "Distance To Centroid": float(dist[medoid]),
+        })
+        for rank, i in enumerate(top, start=1):
+            rows.append({
+                "Cluster": int(cl),
+                "Role": "exemplar",
+                "Rank": rank,
+                "User ID": int(user_ids[members[i]]),
+                "Distance To Centroid": float(dist[i]),
+            })
+
+    return pd.DataFrame(rows, columns=["Cluster", "Role", "Rank", "User ID", "Distance To Centroid"])
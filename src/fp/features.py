@@ -1,14 +1,16 @@
 from __future__ import annotations
 
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Sequence, Tuple
 import numpy as np
 import pandas as pd
 
 from fp.config import DEFAULT_CONFIG
-from fp.io import read_csv, write_csv
-from fp.tags import build_user_tag_cluster_percentages
+from fp.ingest import expand_paths, read_exports
+from fp.io import read_csv, save_json, sidecar_path, write_csv
+from fp.tags import build_user_tag_cluster_percentages, provider_tag_clusters
 
 
 # ---- Update these mappings to your real dictionaries ----
@@ -23,6 +25,45 @@ TAGS_TO_CLUSTER: Dict[str, str] = {
     "georgian": "georgian",
 }
 
+# Rolling windows (days before the reference date) for the recency feature family
+RECENCY_WINDOWS_DAYS = (30, 90, 180)
+
+
+@dataclass(frozen=True)
+class ConcentrationSpec:
+    """
+    How concentrated a user's orders are over one key (vendor, provider, cuisine).
+
+    Produces "<name> Top-<k> Share" (% of the user's orders in their k most
+    frequent keys) for each k, plus "<name> HHI" (sum of squared key shares,
+    0-1) and "<name> Entropy" (bits) when enabled. key is an orders column,
+    or CUISINE_KEY for the provider tag clusters.
+
+    The denominators differ on purpose: Top-k shares of an orders column are
+    over all the user's orders (orders missing the key lower them, as in the
+    legacy Vendor Concentration), while HHI and Entropy describe the spread
+    over the orders that have a key. Cuisine Top-k shares are over tagged
+    orders too.
+    """
+
+    name: str
+    key: str
+    top_k: Tuple[int, ...] = (1, 3, 5)
+    hhi: bool = True
+    entropy: bool = False
+
+
+CUISINE_KEY = "Tag Clusters"
+
+CONCENTRATION_SPECS: Tuple[ConcentrationSpec, ...] = (
+    ConcentrationSpec("Vendor", "Vendor ID"),
+    ConcentrationSpec("Provider", "Provider ID"),
+    ConcentrationSpec("Cuisine", CUISINE_KEY, entropy=True),
+)
+
+# Historical name of the top-3 vendor share
+LEGACY_CONCENTRATION_NAMES = {"Vendor Top-3 Share": "Vendor Concentration"}
+
 REQUIRED_ORDERS_COLS = [
     "User ID",
     "Order ID",
@@ -82,26 +123,28 @@ def _parse_money_eur(series: pd.Series) -> pd.Series:
     return pd.to_numeric(s, errors="coerce")
 
 
-def build_features(
-    orders_path: str,
+def load_inputs(
+    orders_path: str | Sequence[str],
     zones_path: str,
     tags_path: str,
-    out_path: str,
     data_dir: str | None = None,
-    excluded_provider_ids: List[int] | None = None,
-    min_orders_per_user: int | None = None,
-) -> pd.DataFrame:
-    excluded_provider_ids = excluded_provider_ids or DEFAULT_CONFIG.excluded_provider_ids
-    min_orders_per_user = min_orders_per_user or DEFAULT_CONFIG.min_orders_per_user
+    max_workers: int | None = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, dict]:
+    """
+    Read and validate the raw orders / zones / provider-tags exports.
 
+    orders_path may be several files or glob patterns (overlapping monthly /
+    daily exports); they are read in parallel and deduplicated on Order ID,
+    see fp.ingest.read_exports. Returns (orders, zones, tags, ingest stats).
+    """
     # Resolve paths (so CSVs can live outside project folder)
-    orders_path = _resolve_path(orders_path, data_dir)
+    orders_paths = expand_paths(orders_path, data_dir)
     zones_path = _resolve_path(zones_path, data_dir)
     tags_path = _resolve_path(tags_path, data_dir)
 
     tags = read_csv(tags_path)
     zones = read_csv(zones_path)
-    orders = read_csv(orders_path, low_memory=True)
+    orders, ingest = read_exports(orders_paths, id_col="Order ID", max_workers=max_workers)
 
     # Align column name like your original script
     if "Orders Core Info & Metrics User ID" in zones.columns and "User ID" not in zones.columns:
@@ -110,10 +153,265 @@ def build_features(
     _ensure_required(orders, REQUIRED_ORDERS_COLS, "orders")
     _ensure_required(zones, REQUIRED_ZONES_COLS, "zones")
     _ensure_required(tags, REQUIRED_TAGS_COLS, "tags")
+    return orders, zones, tags, ingest
+
+
+def dominant_zones(zones: pd.DataFrame) -> pd.Series:
+    """
+    Each user's most frequent Eater zone (after ZONE_MAPPING), ties broken by name.
+    """
+    z = zones.dropna(subset=["Eater zone"])
+    zone = z["Eater zone"].astype(str)
+    if ZONE_MAPPING:
+        zone = zone.map(lambda v: ZONE_MAPPING.get(v, v))
+    counts = pd.DataFrame({"User ID": z["User ID"], "Zone": zone}).value_counts().rename("n").reset_index()
+    counts = counts.sort_values(["User ID", "n", "Zone"], ascending=[True, False, True], kind="stable")
+    return counts.drop_duplicates(subset=["User ID"]).set_index("User ID")["Zone"]
+
+
+def resolve_reference_date(orders: pd.DataFrame, reference_date: str | pd.Timestamp | None = None) -> pd.Timestamp:
+    """
+    The anchor for recency features: reference_date if given, else the latest
+    delivered order (now when no order has a delivered time). A date without
+    a time ("2025-07-01") covers that whole day: the anchor is its last instant.
+    """
+    if reference_date is not None:
+        anchor = pd.Timestamp(reference_date)
+        date_only = type(reference_date) is date or (isinstance(reference_date, str) and ":" not in reference_date)
+        if date_only and anchor == anchor.normalize():
+            anchor += pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+        return anchor
+    latest = pd.to_datetime(orders["First Order Delivered Time"], errors="coerce").max()
+    return latest if pd.notna(latest) else pd.Timestamp(datetime.now())
+
+
+def build_window_features(
+    orders: pd.DataFrame,
+    reference_date: pd.Timestamp,
+    windows: Sequence[int] = RECENCY_WINDOWS_DAYS,
+) -> pd.DataFrame:
+    """
+    Order count, AOV and refund share over the last N days before reference_date.
+
+    Orders are sorted once by (User ID, delivered time); every window's
+    indicator columns are stacked into one matrix and summed per user with a
+    single np.add.reduceat, instead of filtering and regrouping per window.
+    Expects parsed "First Order Delivered Time" and "Provider Price After Discount".
+    """
+    t = orders["First Order Delivered Time"]
+    valid = t.notna().to_numpy()
+    users = orders["User ID"].to_numpy()[valid]
+    times = t.to_numpy(dtype="datetime64[ns]")[valid]
+    price = orders["Provider Price After Discount"].to_numpy(dtype=np.float64)[valid]
+    refunded = (orders["Is Refunded (Yes / No)"] == "Yes").to_numpy()[valid]
+
+    cols = []
+    for w in windows:
+        cols += [f"Orders {w}d", f"AOV {w}d", f"Refund Percentage {w}d"]
+    if len(users) == 0:
+        return pd.DataFrame(columns=["User ID"] + cols)
+
+    order = np.lexsort((times, users))
+    users, times, price, refunded = users[order], times[order], price[order], refunded[order]
+
+    age_days = (np.datetime64(pd.Timestamp(reference_date)) - times) / np.timedelta64(1, "D")
+    in_w = (age_days[:, None] >= 0) & (age_days[:, None] < np.asarray(windows, dtype=np.float64)[None, :])
+    has_price = ~np.isnan(price)
+
+    # per window: [orders, price sum, priced orders, refunded orders]
+    stacked = np.concatenate([
+        in_w,
+        in_w * np.where(has_price, price, 0.0)[:, None],
+        in_w & has_price[:, None],
+        in_w & refunded[:, None],
+    ], axis=1).astype(np.float64)
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    sums = np.add.reduceat(stacked, starts, axis=0)
+
+    n_w = len(windows)
+    count, price_sum, priced, refunds = (sums[:, i * n_w:(i + 1) * n_w] for i in range(4))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aov = np.where(priced > 0, price_sum / priced, 0.0)
+        refund_pct = np.where(count > 0, refunds / count * 100.0, 0.0)
+
+    out = pd.DataFrame({"User ID": users[starts]})
+    for i, w in enumerate(windows):
+        out[f"Orders {w}d"] = count[:, i]
+        out[f"AOV {w}d"] = aov[:, i]
+        out[f"Refund Percentage {w}d"] = refund_pct[:, i]
+    return out
+
+
+def segmented_top_k(segments: np.ndarray, keys: np.ndarray, ks: Sequence[int]) -> Tuple[np.ndarray, ...]:
+    """
+    Top-k key counts, HHI and entropy of key shares within each segment.
+
+    segments / keys are non-negative integer codes, one row per event. Both
+    sorts run on a single packed int64 key: (segment, key) to count pairs,
+    then (segment, count desc) so every k is a prefix sum of the same
+    ordering. Ties between equal counts do not change a top-k sum, so this
+    matches ranking with method="first".
+    Returns (segment ids, top-k counts [n_segments, len(ks)], total counts,
+    HHI, entropy in bits).
+    """
+    segments = np.asarray(segments, dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(segments) == 0:
+        empty = np.empty(0)
+        return np.empty(0, dtype=np.int64), np.empty((0, len(ks))), empty, empty, empty
+
+    n_keys = int(keys.max()) + 1
+    pairs = np.sort(segments * n_keys + keys)
+    pair_starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+    counts = np.diff(np.r_[pair_starts, len(pairs)])
+
+    span = int(counts.max()) + 1
+    packed = np.sort(pairs[pair_starts] // n_keys * span + (span - 1 - counts))
+    owner, counts = packed // span, span - 1 - packed % span
+    starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    sizes = np.diff(np.r_[starts, len(owner)])
+    pos = np.arange(len(owner)) - np.repeat(starts, sizes)
+
+    in_top = pos[:, None] < np.asarray(ks)[None, :]
+    top = np.add.reduceat(np.where(in_top, counts[:, None], 0), starts, axis=0)
+    total = np.add.reduceat(counts, starts)
+    p = counts / np.repeat(total, sizes)
+    hhi = np.add.reduceat(p ** 2, starts)
+    entropy = 0.0 - np.add.reduceat(p * np.log2(p), starts)
+    return owner[starts], top, total, hhi, entropy
+
+
+def build_concentration_features(
+    orders: pd.DataFrame,
+    tags: pd.DataFrame,
+    specs: Sequence[ConcentrationSpec] = CONCENTRATION_SPECS,
+) -> pd.DataFrame:
+    """
+    Concentration features for every spec from one segmented_top_k call
+    (segments are (spec, user) pairs).
+
+    Shares of order-level keys are over all of the user's orders (orders with
+    a missing key count towards the total only); cuisine shares are over the
+    user's known tag clusters.
+    """
+    user_codes, user_ids = pd.factorize(orders["User ID"])
+    n_users = len(user_ids)
+    has_order = orders["Order ID"].notna().to_numpy() & (user_codes >= 0)
+    order_totals = np.bincount(user_codes[has_order], minlength=n_users).astype(np.float64)
+
+    segs, keys, denominators = [], [], []
+    for i, spec in enumerate(specs):
+        if spec.key == CUISINE_KEY:
+            clusters = provider_tag_clusters(tags, TAGS_TO_CLUSTER)
+            clusters = clusters.loc[clusters[CUISINE_KEY] != "unknown", ["Provider ID", CUISINE_KEY]]
+            pairs = pd.DataFrame({"code": user_codes, "Provider ID": orders["Provider ID"].to_numpy()})[user_codes >= 0]
+            pairs = pairs.merge(clusters, on="Provider ID", how="inner")
+            codes, key_values = pairs["code"].to_numpy(), pairs[CUISINE_KEY]
+            denominators.append(None)
+        else:
+            valid = has_order & orders[spec.key].notna().to_numpy()
+            codes, key_values = user_codes[valid], orders.loc[valid, spec.key]
+            denominators.append(order_totals)
+        segs.append(i * n_users + codes)
+        keys.append(pd.factorize(key_values)[0])
+
+    all_ks = sorted({k for spec in specs for k in spec.top_k})
+    seg_ids, top, total, hhi, entropy = segmented_top_k(np.concatenate(segs), np.concatenate(keys), all_ks)
+
+    out = pd.DataFrame({"User ID": user_ids})
+    for i, spec in enumerate(specs):
+        mask = (seg_ids // n_users) == i
+        rows = seg_ids[mask] % n_users
+        denom = total[mask] if denominators[i] is None else denominators[i][rows]
+        for k in spec.top_k:
+            col = np.zeros(n_users)
+            col[rows] = np.where(denom > 0, (top[mask, all_ks.index(k)] / denom) * 100.0, 0.0)
+            out[f"{spec.name} Top-{k} Share"] = col
+        if spec.hhi:
+            col = np.zeros(n_users)
+            col[rows] = hhi[mask]
+            out[f"{spec.name} HHI"] = col
+        if spec.entropy:
+            col = np.zeros(n_users)
+            col[rows] = entropy[mask]
+            out[f"{spec.name} Entropy"] = col
+    return out.rename(columns=LEGACY_CONCENTRATION_NAMES)
+
+
+def build_features(
+    orders_path: str | Sequence[str],
+    zones_path: str,
+    tags_path: str,
+    out_path: str,
+    data_dir: str | None = None,
+    excluded_provider_ids: List[int] | None = None,
+    min_orders_per_user: int | None = None,
+    reference_date: str | None = None,
+    windows: Sequence[int] = RECENCY_WINDOWS_DAYS,
+    concentration_specs: Sequence[ConcentrationSpec] = CONCENTRATION_SPECS,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Build the feature table and write it to out_path, with a metadata sidecar
+    (<out>.meta.json: inputs, Order ID duplicates removed, feature settings).
+    """
+    orders, zones, tags, ingest = load_inputs(orders_path, zones_path, tags_path, data_dir, max_workers=max_workers)
+    reference_date = resolve_reference_date(orders, reference_date)
+    main_data = build_features_frame(
+        orders,
+        zones,
+        tags,
+        excluded_provider_ids=excluded_provider_ids,
+        min_orders_per_user=min_orders_per_user,
+        reference_date=reference_date,
+        windows=windows,
+        concentration_specs=concentration_specs,
+    )
+    write_csv(main_data, out_path)
+    save_json(
+        {
+            "orders": ingest,
+            "zones": zones_path,
+            "tags": tags_path,
+            "reference_date": str(reference_date),
+            "windows": list(windows),
+            "concentration": [spec.name for spec in concentration_specs],
+            "min_orders_per_user": min_orders_per_user,
+            "n_users": len(main_data),
+        },
+        sidecar_path(out_path, ".meta.json"),
+    )
+    return main_data
+
+
+def build_features_frame(
+    orders: pd.DataFrame,
+    zones: pd.DataFrame,
+    tags: pd.DataFrame,
+    excluded_provider_ids: List[int] | None = None,
+    min_orders_per_user: int | None = None,
+    reference_date: str | pd.Timestamp | None = None,
+    windows: Sequence[int] = RECENCY_WINDOWS_DAYS,
+    concentration_specs: Sequence[ConcentrationSpec] = CONCENTRATION_SPECS,
+) -> pd.DataFrame:
+    """
+    User-level feature table from already loaded exports (see load_inputs).
+
+    reference_date anchors the recency windows and Months Since Last Order
+    (default: the latest delivered order, see resolve_reference_date). Orders
+    delivered after it are left out, so the table is a snapshot as of that date.
+    """
+    excluded_provider_ids = excluded_provider_ids or DEFAULT_CONFIG.excluded_provider_ids
+    min_orders_per_user = min_orders_per_user or DEFAULT_CONFIG.min_orders_per_user
 
     # Filter providers
     orders = orders[~orders["Provider ID"].isin(excluded_provider_ids)].copy()
 
+    # Anchor: drop orders delivered after it
+    orders["First Order Delivered Time"] = pd.to_datetime(orders["First Order Delivered Time"], errors="coerce")
+    now = resolve_reference_date(orders, reference_date)
+    orders = orders[~(orders["First Order Delivered Time"] > now)]
+
     # Merge provider rating into orders (like you did)
     orders = orders.merge(tags[["Provider ID", "Historical Average Rating"]], on="Provider ID", how="left")
 
@@ -134,10 +432,9 @@ def build_features(
     main_data = no_discount.drop(columns=["No_Discount_Percentage"])
 
     # Core aggregates
-    orders["First Order Delivered Time"] = pd.to_datetime(orders["First Order Delivered Time"], errors="coerce")
     grouped = orders.groupby("User ID").agg(
         Order_Count=("Order ID", "count"),
-        Months_Since_Last_Order=("First Order Delivered Time", lambda x: (datetime.now() - x.max()).days / 30 if pd.notna(x.max()) else np.nan),
+        Months_Since_Last_Order=("First Order Delivered Time", lambda x: (now - x.max()).days / 30 if pd.notna(x.max()) else np.nan),
         Refund_Percentage=("Is Refunded (Yes / No)", lambda x: (x == "Yes").mean() * 100.0),
         Avg_Provider_Price=("Provider Price After Discount", "mean"),
     ).reset_index()
@@ -231,15 +528,18 @@ def build_features(
     main_data = main_data.merge(gmv_disc, on="User ID", how="left")
     main_data["GMV Discount Percentage"] = main_data["GMV Discount Percentage"].fillna(0)
 
-    # Vendor concentration (top 3 vendors share)
-    voc = orders.groupby(["User ID", "Vendor ID"]).agg(Vendor_Order_Count=("Order ID", "count")).reset_index()
-    voc["Vendor_Rank"] = voc.groupby("User ID")["Vendor_Order_Count"].rank(method="first", ascending=False)
-    top3 = voc[voc["Vendor_Rank"] <= 3]
-    totals = orders.groupby("User ID")["Order ID"].count().rename("Total_Order_Count").reset_index()
-    top3sum = top3.groupby("User ID")["Vendor_Order_Count"].sum().rename("Top_3_Order_Count").reset_index()
-    vp = totals.merge(top3sum, on="User ID", how="left").fillna({"Top_3_Order_Count": 0})
-    vp["Vendor Concentration"] = np.where(vp["Total_Order_Count"] > 0, (vp["Top_3_Order_Count"] / vp["Total_Order_Count"]) * 100.0, 0.0)
-    main_data = main_data.merge(vp[["User ID", "Vendor Concentration"]], on="User ID", how="left")
+    # Concentration (top-k shares / HHI / entropy over vendors, providers, cuisines)
+    if concentration_specs:
+        conc = build_concentration_features(orders, tags, concentration_specs)
+        main_data = main_data.merge(conc, on="User ID", how="left")
+
+    # Recency windows (order count / AOV / refund share over the last N days)
+    if windows:
+        main_data = main_data.merge(build_window_features(orders, now, windows), on="User ID", how="left")
+
+    # Remove users without a delivered order up to the anchor (NaN months);
+    # those ordering on the anchor day itself have 0 months and are kept
+    main_data = main_data[main_data["Months_Since_Last_Order"] >= 0]
 
     # Final cleaning / naming
     main_data = main_data.fillna(0)
@@ -249,9 +549,6 @@ def build_features(
         if col in main_data.columns:
             main_data = main_data.drop(columns=[col])
 
-    # Remove invalid months (optional)
-    main_data = main_data[main_data["Months_Since_Last_Order"] > 0]
-
     # Rename columns nicely (and FIXED your old rename bug)
     main_data = main_data.rename(columns={
         "Order_Count": "Order Count",
@@ -263,6 +560,4 @@ def build_features(
     # Apply min orders filter
     main_data["User ID"] = main_data["User ID"].astype(int)
     main_data = main_data[main_data["Order Count"] >= min_orders_per_user].copy()
-
-    write_csv(main_data, out_path)
     return main_data
\ No newline at end of file
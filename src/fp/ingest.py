@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import glob
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+def expand_paths(patterns: str | Sequence[str], data_dir: str | None = None) -> List[str]:
+    """
+    Files named by paths / glob patterns, in the order given (each glob sorted),
+    relative ones resolved against data_dir. Repeated files are kept once.
+    """
+    if isinstance(patterns, (str, Path)):
+        patterns = [patterns]
+    out: List[str] = []
+    for pattern in patterns:
+        p = Path(pattern)
+        if not p.is_absolute() and data_dir is not None:
+            p = Path(data_dir) / p
+        if glob.has_magic(str(p)):
+            matches = sorted(glob.glob(str(p)))
+            if not matches:
+                raise ValueError(f"No files match {pattern!r}")
+        else:
+            matches = [str(p)]
+        out += [m for m in matches if m not in out]
+    return out
+
+
+def _first_seen(ids: pd.Series, seen: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mask of ids not in `seen` (sorted, unique) and not repeated earlier in the
+    chunk, plus `seen` with the new ids merged in. Membership is one
+    searchsorted of the sorted chunk ids; the merge is a stable sort of two
+    sorted runs (linear). Missing ids are always kept (nothing to dedup on).
+    """
+    missing = ids.isna().to_numpy()
+    candidate = np.flatnonzero(~ids.duplicated().to_numpy() & ~missing)
+    values = ids.to_numpy()
+    by_value = np.argsort(values[candidate], kind="stable")
+    candidate = candidate[by_value]
+    new = values[candidate]
+    if seen is not None and len(seen):
+        # sorted queries let searchsorted walk `seen` forwards
+        pos = np.minimum(np.searchsorted(seen, new), len(seen) - 1)
+        fresh = seen[pos] != new
+        candidate, new = candidate[fresh], new[fresh]
+    keep = missing.copy()
+    keep[candidate] = True
+    seen = new if seen is None else np.sort(np.concatenate([seen, new]), kind="stable")
+    return keep, seen
+
+
+def _read_deduped(path: str, id_col: str | None, chunksize: int) -> Tuple[pd.DataFrame, int]:
+    """
+    One file read in chunks, dropping ids repeated within the file.
+    Returns (rows, rows read).
+    """
+    seen = None
+    parts, n_read = [], 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, low_memory=True):
+        n_read += len(chunk)
+        if id_col is not None:
+            keep, seen = _first_seen(chunk[id_col], seen)
+            chunk = chunk[keep]
+        parts.append(chunk)
+    if not parts:
+        return pd.read_csv(path, nrows=0), 0
+    return pd.concat(parts, ignore_index=True), n_read
+
+
+def read_exports(
+    paths: Sequence[str],
+    id_col: str | None = "Order ID",
+    chunksize: int = 250_000,
+    max_workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Concatenate overlapping CSV exports, keeping the first occurrence of each id.
+
+    Files are parsed in a thread pool (the CSV parser releases the GIL), each
+    deduplicated chunk by chunk against its own ids. At most max_workers files
+    are in flight: results are consumed in file order as they complete and
+    filtered against the ids kept so far, so earlier files win and only a
+    window of raw per-file frames is ever held at once.
+    """
+    if not paths:
+        raise ValueError("No input files")
+    n_workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    seen = None
+    parts, stats = [], {"files": list(paths), "rows_read": 0, "duplicates_removed": 0}
+
+    def consume(future):
+        nonlocal seen
+        df, n_read = future.result()
+        stats["rows_read"] += n_read
+        if id_col is not None:
+            keep, seen = _first_seen(df[id_col], seen)
+            df = df[keep]
+        parts.append(df)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        pending: deque = deque()
+        for path in paths:
+            pending.append(pool.submit(_read_deduped, path, id_col, chunksize))
+            if len(pending) >= n_workers:
+                consume(pending.popleft())
+        while pending:
+            consume(pending.popleft())
+
+    out = pd.concat(parts, ignore_index=True)
+    stats["rows"] = len(out)
+    stats["duplicates_removed"] = stats["rows_read"] - len(out)
+    return out, stats
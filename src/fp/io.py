@@ -17,3 +17,10 @@ def save_json(obj: dict, path: str | Path) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def sidecar_path(path: str | Path, suffix: str) -> Path:
+    """
+    Path of a file stored next to `path`, e.g. linkage.npy -> linkage.users.npy
+    """
+    return Path(path).with_suffix(suffix)
@@ -1,12 +1,77 @@
 from __future__ import annotations
 
+import warnings
 from typing import List
 import numpy as np
 import pandas as pd
 from scipy.cluster.hierarchy import linkage
-from sklearn.preprocessing import StandardScaler
 
-from fp.io import read_csv, save_json
+from fp.io import save_json
+from fp.sampling import sample_features, user_ids_path
+from fp.tree import build_condensed_tree, save_tree, tree_path
+
+
+DTYPES = ("float64", "float32")
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype!r} (expected one of {DTYPES})")
+    return dtype
+
+
+def scale_features(X: pd.DataFrame, scale: bool = True, dtype: str = "float64") -> np.ndarray:
+    """
+    Feature matrix in `dtype`, standardised when `scale`.
+
+    Same result as sklearn's StandardScaler (population std, constant columns
+    left unscaled, float64 accumulation) without importing scikit-learn.
+    """
+    Xv = X.to_numpy(dtype=check_dtype(dtype))
+    if scale:
+        mean = Xv.mean(axis=0, dtype=np.float64)
+        std = Xv.std(axis=0, dtype=np.float64)
+        std[std < 10 * np.finfo(np.float64).eps * np.maximum(np.abs(mean), 1.0)] = 1.0
+        Xv = ((Xv - mean) / std).astype(dtype, copy=False)
+    return Xv
+
+
+def knn_ward_linkage(Xv: np.ndarray, n_neighbors: int = 15) -> np.ndarray:
+    """
+    Ward linkage restricted to a sparse k-nearest-neighbour graph, as a scipy
+    linkage matrix.
+
+    Only clusters joined by a graph edge may merge, so memory and time grow
+    with n * n_neighbors instead of n^2. Disconnected graph components are
+    bridged by scikit-learn before merging. Heights use scipy's Ward scale;
+    they are made non-decreasing so fcluster and dendrograms behave.
+    """
+    from sklearn.cluster import ward_tree
+    from sklearn.neighbors import kneighbors_graph
+
+    n = len(Xv)
+    if n < 2:
+        raise ValueError("Need at least 2 rows for a linkage")
+    if n_neighbors < 1:
+        raise ValueError(f"n_neighbors must be >= 1, got {n_neighbors}")
+
+    X64 = np.asarray(Xv, dtype=np.float64)
+    graph = kneighbors_graph(X64, n_neighbors=min(n_neighbors, n - 1), include_self=False)
+    with warnings.catch_warnings():
+        # sklearn warns when it has to bridge disconnected graph components
+        warnings.filterwarnings("ignore", message="the number of connected components")
+        children, _, _, _, heights = ward_tree(X64, connectivity=graph, return_distance=True)
+
+    children = np.sort(children, axis=1)
+    sizes = np.ones(2 * n - 1, dtype=np.int64)
+    for i, (a, b) in enumerate(children):
+        sizes[n + i] = sizes[a] + sizes[b]
+
+    Z = np.empty((n - 1, 4), dtype=np.float64)
+    Z[:, :2] = children
+    Z[:, 2] = np.maximum.accumulate(heights)
+    Z[:, 3] = sizes[n:]
+    return Z
 
 
 def compute_linkage(
@@ -17,13 +82,35 @@ def compute_linkage(
     method: str = "ward",
     scale: bool = True,
     max_rows: int | None = 40000,
+    sample: str = "head",
+    seed: int = 0,
+    stratify_col: str | None = None,
+    stratify_bins: List[float] | None = None,
+    dtype: str = "float64",
+    knn: int | None = None,
 ) -> np.ndarray:
-    df = read_csv(features_csv)
-
-    if max_rows is not None:
-        df = df.iloc[:max_rows].copy()
+    """
+    Linkage over (a sample of) the features CSV, saved with its user-id and
+    condensed-tree sidecars.
 
+    knn=k builds a Ward hierarchy constrained to the k-nearest-neighbour graph
+    (see knn_ward_linkage), which scales to far more rows than plain linkage.
+    """
+    check_dtype(dtype)
+    if knn is not None and method != "ward":
+        raise ValueError(f"knn-constrained linkage only supports method='ward', got {method!r}")
     needed = ["User ID"] + feature_cols
+    df = sample_features(
+        features_csv,
+        needed,
+        max_rows,
+        mode=sample,
+        seed=seed,
+        stratify_col=stratify_col,
+        stratify_bins=stratify_bins,
+        dtype=dtype,
+    )
+
     missing = [c for c in needed if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns in features: {missing}")
@@ -31,23 +118,38 @@ def compute_linkage(
     X = df[feature_cols].copy()
     X = X.fillna(0.0)
 
-    if scale:
-        scaler = StandardScaler()
-        Xv = scaler.fit_transform(X.values)
-    else:
-        Xv = X.values
+    Xv = scale_features(X, scale=scale, dtype=dtype)
 
-    Z = linkage(Xv, method=method)
+    # scipy computes the linkage in float64 internally; the saved matrix follows `dtype`
+    # (float32 keeps node ids exact up to 2**24 rows)
+    Z = knn_ward_linkage(Xv, knn) if knn is not None else linkage(Xv, method=method)
+    Z = Z.astype(dtype, copy=False)
     np.save(out_npy, Z)
 
+    # Linkage rows follow this order; cluster/dendrogram read it back
+    ids_npy = user_ids_path(out_npy)
+    np.save(ids_npy, df["User ID"].astype("int64").to_numpy())
+
+    # Condensed tree (heights, sizes, raw-feature means per merge) for interactive views
+    tree_npz = tree_path(out_npy)
+    save_tree(build_condensed_tree(Z, X.to_numpy(dtype=dtype), feature_cols), tree_npz)
+
     if meta_json:
         save_json(
             {
                 "features_csv": features_csv,
                 "feature_cols": feature_cols,
                 "method": method,
+                "knn": knn,
                 "scale": scale,
                 "max_rows": max_rows,
+                "sample": sample,
+                "seed": seed,
+                "stratify_col": stratify_col,
+                "stratify_bins": stratify_bins,
+                "dtype": dtype,
+                "user_ids_npy": str(ids_npy),
+                "tree_npz": str(tree_npz),
             },
             meta_json,
         )
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from fp.io import write_csv
+from fp.sampling import load_rows_for_users
+
+
+INDEX_FILE = "neighbors.pkl"
+
+
+class NeighborIndex:
+    """
+    KD-tree over a run's users in scaled feature space.
+
+    Positions in the tree follow `user_ids`; per-cluster trees for restricted
+    queries are built on first use and kept in memory (not persisted).
+    """
+
+    def __init__(self, user_ids: np.ndarray, clusters: np.ndarray, X: np.ndarray, feature_cols: List[str], leaf_size: int = 40):
+        self.user_ids = np.asarray(user_ids, dtype="int64")
+        self.clusters = np.asarray(clusters, dtype="int32")
+        self.feature_cols = list(feature_cols)
+        self.tree = KDTree(np.asarray(X, dtype="float64"), leaf_size=leaf_size)
+        self._order = np.argsort(self.user_ids, kind="stable")
+        self._cluster_trees: Dict[int, tuple] = {}
+
+    @property
+    def X(self) -> np.ndarray:
+        return np.asarray(self.tree.data)
+
+    def positions(self, user_ids: Sequence[int]) -> np.ndarray:
+        q = np.asarray(user_ids, dtype="int64")
+        sorted_ids = self.user_ids[self._order]
+        pos = np.minimum(np.searchsorted(sorted_ids, q), len(sorted_ids) - 1)
+        found = sorted_ids[pos] == q
+        if not found.all():
+            raise KeyError(f"Users not in index: {q[~found][:5].tolist()}")
+        return self._order[pos]
+
+    def _tree_for(self, cluster: Optional[int]):
+        if cluster is None:
+            return self.tree, None
+        cluster = int(cluster)
+        if cluster not in self._cluster_trees:
+            members = np.flatnonzero(self.clusters == cluster)
+            if len(members) == 0:
+                raise KeyError(f"Unknown cluster: {cluster}")
+            self._cluster_trees[cluster] = (KDTree(self.X[members]), members)
+        return self._cluster_trees[cluster]
+
+    def query(self, seed_user_ids: Sequence[int], k: int = 10, cluster: Optional[int] = None) -> pd.DataFrame:
+        """
+        Top-k most similar users for every seed (one batched tree query).
+        Seeds never appear in their own results.
+        """
+        seeds = np.asarray(seed_user_ids, dtype="int64")
+        seed_pos = self.positions(seeds)
+        tree, members = self._tree_for(cluster)
+        k_fetch = min(k + 1, tree.data.shape[0])
+        dist, idx = tree.query(self.X[seed_pos], k=k_fetch)
+        if members is not None:
+            idx = members[idx]
+
+        keep = idx != seed_pos[:, None]
+        rank = np.cumsum(keep, axis=1)
+        keep &= rank <= k
+        row, _ = np.nonzero(keep)
+        hits = idx[keep]
+        return pd.DataFrame({
+            "Seed User ID": seeds[row],
+            "Rank": rank[keep],
+            "User ID": self.user_ids[hits],
+            "Cluster": self.clusters[hits],
+            "Distance": dist[keep],
+        })
+
+    def save(self, path: str | Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(
+                {"user_ids": self.user_ids, "clusters": self.clusters, "feature_cols": self.feature_cols, "tree": self.tree},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NeighborIndex":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        idx = cls.__new__(cls)
+        idx.user_ids = state["user_ids"]
+        idx.clusters = state["clusters"]
+        idx.feature_cols = state["feature_cols"]
+        idx.tree = state["tree"]
+        idx._order = np.argsort(idx.user_ids, kind="stable")
+        idx._cluster_trees = {}
+        return idx
+
+
+def build_neighbor_index(features_csv: str, run_dir: str, leaf_size: int = 40) -> NeighborIndex:
+    """
+    Build and save <run_dir>/neighbors.pkl over the run's users, scaled with
+    the scaler recorded in run_meta.json.
+    """
+    run = Path(run_dir)
+    meta = json.loads((run / "run_meta.json").read_text(encoding="utf-8"))
+    feature_cols = meta["feature_cols"]
+    scaler = meta.get("scaler")
+    if not scaler:
+        raise ValueError(f"{run / 'run_meta.json'} has no scaler; re-run fp cluster first")
+
+    users = pd.read_csv(run / "clustered_users.csv", usecols=["User ID", "Cluster"])
+    rows = load_rows_for_users(features_csv, ["User ID"] + feature_cols, users["User ID"].to_numpy(), dtype=meta.get("dtype"))
+    X = rows[feature_cols].fillna(0.0).to_numpy(dtype="float64")
+    Xs = (X - np.asarray(scaler["mean"])) / np.asarray(scaler["scale"])
+
+    idx = NeighborIndex(users["User ID"].to_numpy(), users["Cluster"].to_numpy(), Xs, feature_cols, leaf_size=leaf_size)
+    idx.save(run / INDEX_FILE)
+    return idx
+
+
+def query_neighbors(
+    run_dir: str,
+    seed_user_ids: Sequence[int],
+    k: int = 10,
+    cluster: Optional[int] = None,
+    out_csv: str | None = None,
+) -> pd.DataFrame:
+    idx = NeighborIndex.load(Path(run_dir) / INDEX_FILE)
+    res = idx.query(seed_user_ids, k=k, cluster=cluster)
+    if out_csv:
+        write_csv(res, out_csv)
+    return res
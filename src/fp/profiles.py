@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+
+
+PROFILE_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def _segments(keys: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+class QuantileSketches:
+    """
+    Mergeable log-bucket quantile sketches (DDSketch-style), one per (group, column).
+
+    Each value is counted in a bucket whose bounds are a factor
+    gamma = (1 + a) / (1 - a) apart, so any quantile is returned within
+    relative error `a`. Values with |x| < min_value share a zero bucket.
+    Buckets are plain counts: sketches from different chunks merge exactly.
+    """
+
+    def __init__(self, n_cols: int, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.n_cols = n_cols
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._log_gamma = np.log((1.0 + relative_accuracy) / (1.0 - relative_accuracy))
+        self._offset = 1 - int(np.floor(np.log(min_value) / self._log_gamma))
+        self.groups = np.empty(0, dtype=np.int64)
+        self.cols = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def _bucket_keys(self, X: np.ndarray) -> np.ndarray:
+        """
+        Signed bucket index, monotone in x: negative values get negative keys,
+        the zero bucket is 0.
+        """
+        mag = np.abs(X)
+        big = mag >= self.min_value
+        idx = np.zeros(X.shape, dtype=np.int64)
+        idx[big] = np.ceil(np.log(mag[big]) / self._log_gamma).astype(np.int64) + self._offset
+        return np.sign(X).astype(np.int64) * idx
+
+    def _key_values(self, keys: np.ndarray) -> np.ndarray:
+        i = np.abs(keys) - self._offset
+        gamma = np.exp(self._log_gamma)
+        value = 2.0 * np.exp(i * self._log_gamma) / (gamma + 1.0)
+        return np.where(keys == 0, 0.0, np.sign(keys) * value)
+
+    def _absorb(self, groups, cols, keys, counts) -> None:
+        groups = np.r_[self.groups, groups]
+        cols = np.r_[self.cols, cols]
+        keys = np.r_[self.keys, keys]
+        counts = np.r_[self.counts, counts]
+        order = np.lexsort((keys, cols, groups))
+        groups, cols, keys, counts = groups[order], cols[order], keys[order], counts[order]
+        new = np.r_[True, (groups[1:] != groups[:-1]) | (cols[1:] != cols[:-1]) | (keys[1:] != keys[:-1])]
+        starts = np.flatnonzero(new)
+        self.groups, self.cols, self.keys = groups[starts], cols[starts], keys[starts]
+        self.counts = np.add.reduceat(counts, starts) if len(counts) else counts
+
+    def add(self, X: np.ndarray, groups: np.ndarray) -> "QuantileSketches":
+        X = np.asarray(X, dtype=np.float64).reshape(len(groups), self.n_cols)
+        keep = ~np.isnan(X)
+        g = np.broadcast_to(np.asarray(groups, dtype=np.int64)[:, None], X.shape)[keep]
+        c = np.broadcast_to(np.arange(self.n_cols, dtype=np.int64)[None, :], X.shape)[keep]
+        self._absorb(g, c, self._bucket_keys(X[keep]), np.ones(len(g), dtype=np.int64))
+        return self
+
+    def merge(self, other: "QuantileSketches") -> "QuantileSketches":
+        if (other.n_cols, other.relative_accuracy, other.min_value) != (self.n_cols, self.relative_accuracy, self.min_value):
+            raise ValueError("Can only merge sketches with the same columns and accuracy")
+        self._absorb(other.groups, other.cols, other.keys, other.counts)
+        return self
+
+    def quantiles(self, group_ids: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+        """
+        Array [len(group_ids), n_cols, len(qs)]; NaN where a sketch is empty.
+        """
+        out = np.full((len(group_ids), self.n_cols, len(qs)), np.nan)
+        if not len(self.counts):
+            return out
+        seg = np.r_[True, (self.groups[1:] != self.groups[:-1]) | (self.cols[1:] != self.cols[:-1])]
+        starts = np.flatnonzero(seg)
+        cum = np.cumsum(self.counts)
+        before = np.r_[0, cum[starts[1:] - 1]]
+        n = np.diff(np.r_[before, cum[-1]])
+
+        row = np.searchsorted(group_ids, self.groups[starts])
+        present = (row < len(group_ids)) & (group_ids[np.minimum(row, len(group_ids) - 1)] == self.groups[starts])
+        for j, q in enumerate(qs):
+            pos = np.searchsorted(cum, before + q * (n - 1), side="right")
+            out[row[present], self.cols[starts][present], j] = self._key_values(self.keys[pos])[present]
+        return out
+
+
+class ClusterProfiler:
+    """
+    Per-cluster count / mean / std (Chan's parallel update) plus quantile
+    sketches, fed chunk by chunk; merge() combines profilers built elsewhere.
+    """
+
+    def __init__(self, feature_cols: List[str], relative_accuracy: float = 0.01):
+        self.feature_cols = list(feature_cols)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.n = np.empty(0, dtype=np.int64)
+        self.mean = np.empty((0, len(self.feature_cols)))
+        self.m2 = np.empty((0, len(self.feature_cols)))
+        self.sketches = QuantileSketches(len(self.feature_cols), relative_accuracy=relative_accuracy)
+
+    def _combine(self, ids, n, mean, m2) -> None:
+        ids = np.r_[self.ids, ids]
+        n = np.r_[self.n, n]
+        mean = np.vstack([self.mean, mean])
+        m2 = np.vstack([self.m2, m2])
+        order = np.argsort(ids, kind="stable")
+        ids, n, mean, m2 = ids[order], n[order], mean[order], m2[order]
+
+        starts = _segments(ids)
+        total = np.add.reduceat(n, starts)
+        new_mean = np.add.reduceat(mean * n[:, None], starts, axis=0) / total[:, None]
+        rep = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(ids)]))
+        new_m2 = np.add.reduceat(m2 + n[:, None] * (mean - new_mean[rep]) ** 2, starts, axis=0)
+        self.ids, self.n, self.mean, self.m2 = ids[starts], total, new_mean, new_m2
+
+    def update(self, X: np.ndarray, labels: np.ndarray) -> "ClusterProfiler":
+        X = np.asarray(X, dtype=np.float64)
+        labels = np.asarray(labels, dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        Xo, lo = X[order], labels[order]
+        starts = _segments(lo)
+        n = np.diff(np.r_[starts, len(lo)])
+        mean = np.add.reduceat(Xo, starts, axis=0) / n[:, None]
+        m2 = np.add.reduceat((Xo - np.repeat(mean, n, axis=0)) ** 2, starts, axis=0)
+        self._combine(lo[starts], n, mean, m2)
+        self.sketches.add(X, labels)
+        return self
+
+    def merge(self, other: "ClusterProfiler") -> "ClusterProfiler":
+        if other.feature_cols != self.feature_cols:
+            raise ValueError("Can only merge profilers over the same feature columns")
+        self._combine(other.ids, other.n, other.mean, other.m2)
+        self.sketches.merge(other.sketches)
+        return self
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Long table: one row per (Cluster, Feature) with Count, Mean, Std,
+        P10, Median, P90 and Z (cluster mean minus overall mean, in units of
+        the overall population std, i.e. the centroid in scaled space).
+        """
+        total = self.n.sum()
+        g_mean = (self.mean * self.n[:, None]).sum(axis=0) / total
+        g_m2 = (self.m2 + self.n[:, None] * (self.mean - g_mean) ** 2).sum(axis=0)
+        g_std = np.sqrt(g_m2 / total)
+        g_std[g_std == 0.0] = 1.0
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(self.m2 / (self.n[:, None] - 1))
+        q = self.sketches.quantiles(self.ids, PROFILE_QUANTILES)
+        n_feat = len(self.feature_cols)
+        return pd.DataFrame({
+            "Cluster": np.repeat(self.ids, n_feat),
+            "Feature": np.tile(self.feature_cols, len(self.ids)),
+            "Count": np.repeat(self.n, n_feat),
+            "Mean": self.mean.ravel(),
+            "Std": std.ravel(),
+            "P10": q[:, :, 0].ravel(),
+            "Median": q[:, :, 1].ravel(),
+            "P90": q[:, :, 2].ravel(),
+            "Z": ((self.mean - g_mean) / g_std).ravel(),
+        })
+
+
+def cluster_profiles(
+    X: np.ndarray,
+    labels: np.ndarray,
+    feature_cols: List[str],
+    chunksize: int = 100_000,
+    relative_accuracy: float = 0.01,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    ClusterProfiler.frame() over X, fed in chunks so the sketch buffers stay
+    bounded for full-population runs. Each chunk is accumulated in float64;
+    the statistics are stored in `dtype` when given (e.g. float32 runs).
+    """
+    profiler = ClusterProfiler(feature_cols, relative_accuracy=relative_accuracy)
+    for start in range(0, len(labels), chunksize):
+        profiler.update(X[start:start + chunksize], labels[start:start + chunksize])
+    out = profiler.frame()
+    if dtype is not None:
+        stats = ["Mean", "Std", "P10", "Median", "P90", "Z"]
+        out[stats] = out[stats].astype(dtype)
+    return out
+
+
+def profile_means(profiles: pd.DataFrame) -> pd.DataFrame:
+    """
+    Wide Cluster x Feature table of means (the cluster_means.csv layout).
+    """
+    feature_order = list(dict.fromkeys(profiles["Feature"]))
+    wide = profiles.pivot(index="Cluster", columns="Feature", values="Mean")[feature_order]
+    wide.columns.name = None
+    return wide.reset_index()
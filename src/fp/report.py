@@ -10,6 +10,8 @@ def generate_report(run_dir: str, out_path: str) -> None:
     meta_path = run / "run_meta.json"
     summary_path = run / "cluster_summary.csv"
     means_path = run / "cluster_means.csv"
+    exemplars_path = run / "cluster_exemplars.csv"
+    profiles_path = run / "cluster_profiles.csv"
 
     summary = read_csv(summary_path)
     means = read_csv(means_path)
@@ -23,9 +25,31 @@ def generate_report(run_dir: str, out_path: str) -> None:
         meta = json.loads(meta_path.read_text(encoding="utf-8"))
         lines.append("## Run Metadata")
         for k, v in meta.items():
+            if k in ("auto", "stable_ids"):
+                continue
             lines.append(f"- **{k}**: {v}")
+        stable = meta.get("stable_ids")
+        if stable:
+            new_ids = ", ".join(str(i) for i in stable["new_ids"]) or "none"
+            lines.append(
+                f"- **stable_ids**: clusters renumbered to match {stable['reference']} "
+                f"by {stable['method']} (new ids: {new_ids})"
+            )
         lines.append("")
 
+        auto = meta.get("auto")
+        if auto:
+            lines.append("## Automatic cut selection")
+            lines.append(
+                f"Chosen **k = {auto['chosen_k']}** by {auto['method']} "
+                f"(gap: {auto['k_gap']}, height acceleration: {auto['k_acceleration']})."
+            )
+            lines.append("")
+            scores = pd.DataFrame.from_dict(auto["scores"], orient="index")
+            scores.index.name = "k"
+            lines.append(scores.reset_index().to_markdown(index=False, floatfmt=".4f"))
+            lines.append("")
+
     lines.append("## Cluster Summary")
     lines.append(summary.to_markdown(index=False))
     lines.append("")
@@ -34,8 +58,30 @@ def generate_report(run_dir: str, out_path: str) -> None:
     lines.append(means.to_markdown(index=False))
     lines.append("")
 
-    # Auto “label hints” by top features per cluster
-    if "Cluster" in means.columns:
+    if exemplars_path.exists():
+        exemplars = read_csv(exemplars_path)
+        lines.append("## Exemplar users")
+        lines.append("Medoid and the users closest to each cluster centroid (scaled feature space).")
+        lines.append("")
+        lines.append(exemplars.to_markdown(index=False, floatfmt=".3f"))
+        lines.append("")
+
+    # Auto “label hints”: features that set each cluster apart, by z-score
+    if profiles_path.exists():
+        profiles = read_csv(profiles_path)
+        lines.append("## Auto label hints")
+        lines.append("Features furthest from the overall mean (z = difference in overall standard deviations).")
+        lines.append("")
+        for cl, rows in profiles.groupby("Cluster", sort=True):
+            top3 = rows.loc[rows["Z"].abs().sort_values(ascending=False).index[:3]]
+            hint = ", ".join(
+                f"{r['Feature']} {'↑' if r['Z'] >= 0 else '↓'} (z={r['Z']:+.2f}, median {r['Median']:.2f})"
+                for _, r in top3.iterrows()
+            )
+            lines.append(f"- Cluster **{int(cl)}**: {hint}")
+        lines.append("")
+    elif "Cluster" in means.columns:
+        # runs written before cluster_profiles.csv existed
         feature_cols = [c for c in means.columns if c != "Cluster"]
         lines.append("## Auto label hints")
         for _, row in means.iterrows():
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+
+from fp.io import sidecar_path
+
+
+SAMPLE_MODES = ("head", "reservoir", "stratified")
+
+_KEY = "__sample_key"
+_POS = "__sample_pos"
+_STRATUM = "__sample_stratum"
+
+
+def user_ids_path(linkage_npy: str | Path) -> Path:
+    """
+    Where the User IDs of the linkage rows are stored (same order as the rows).
+    """
+    return sidecar_path(linkage_npy, ".users.npy")
+
+
+def _usecols(columns: Sequence[str], extra: str | None = None):
+    wanted = set(columns)
+    if extra is not None:
+        wanted.add(extra)
+    return lambda c: c in wanted
+
+
+def _dtypes(columns: Sequence[str], dtype: str | None):
+    if dtype is None:
+        return None
+    return {c: dtype for c in columns if c != "User ID"}
+
+
+def _strata(chunk: pd.DataFrame, stratify_col: str, stratify_bins: List[float] | None) -> pd.Series:
+    if stratify_bins:
+        values = pd.to_numeric(chunk[stratify_col], errors="coerce")
+        edges = [-np.inf] + sorted(stratify_bins) + [np.inf]
+        return pd.Series(pd.cut(values, bins=edges, labels=False), index=chunk.index).fillna(-1)
+    return chunk[stratify_col].astype(str)
+
+
+def _allocate(counts: pd.Series, k: int) -> pd.Series:
+    """
+    Proportional allocation of k rows over strata (largest remainder).
+    """
+    total = int(counts.sum())
+    if total <= k:
+        return counts.copy()
+    quota = counts * (k / total)
+    alloc = np.floor(quota).astype(int)
+    remainder = k - int(alloc.sum())
+    if remainder > 0:
+        order = (quota - alloc).sort_values(ascending=False, kind="stable").index[:remainder]
+        alloc.loc[order] += 1
+    return alloc
+
+
+def sample_features(
+    features_csv: str,
+    columns: Sequence[str],
+    max_rows: int | None,
+    mode: str = "head",
+    seed: int = 0,
+    stratify_col: str | None = None,
+    stratify_bins: List[float] | None = None,
+    chunksize: int = 100_000,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    Read at most `max_rows` rows of `columns` from the features CSV.
+
+    - head: first rows of the file (legacy behaviour)
+    - reservoir: seeded uniform sample, one pass over the file in chunks
+    - stratified: proportional sample per value (or bin) of `stratify_col`
+
+    Only the requested columns and the current reservoir are held in memory.
+    Sampled rows keep their file order. `dtype` (e.g. "float32") is applied to
+    every requested column except User ID while parsing.
+    """
+    if mode not in SAMPLE_MODES:
+        raise ValueError(f"Unknown sample mode: {mode!r} (expected one of {SAMPLE_MODES})")
+
+    if mode == "head" or max_rows is None:
+        return pd.read_csv(features_csv, usecols=_usecols(columns), nrows=max_rows, dtype=_dtypes(columns, dtype), low_memory=False)
+
+    if mode == "stratified" and stratify_col is None:
+        raise ValueError("stratified sampling needs stratify_col")
+
+    k = int(max_rows)
+    rng = np.random.default_rng(seed)
+    extra = stratify_col if mode == "stratified" else None
+    reservoir: pd.DataFrame | None = None
+    counts = pd.Series(dtype="int64")
+    pos = 0
+
+    reader = pd.read_csv(
+        features_csv,
+        usecols=_usecols(columns, extra),
+        chunksize=chunksize,
+        dtype=_dtypes(columns, dtype),
+        low_memory=False,
+    )
+    for chunk in reader:
+        chunk[_KEY] = rng.random(len(chunk))
+        chunk[_POS] = np.arange(pos, pos + len(chunk))
+        pos += len(chunk)
+
+        if mode == "stratified":
+            if stratify_col not in chunk.columns:
+                raise ValueError(f"Missing stratify column in features: {stratify_col!r}")
+            chunk[_STRATUM] = _strata(chunk, stratify_col, stratify_bins)
+            counts = counts.add(chunk[_STRATUM].value_counts(), fill_value=0).astype("int64")
+
+        combined = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+
+        # Bottom-k by random key == uniform reservoir sample (per stratum when stratified)
+        if mode == "reservoir":
+            if len(combined) > k:
+                keep = np.argpartition(combined[_KEY].to_numpy(), k - 1)[:k]
+                combined = combined.iloc[np.sort(keep)]
+        else:
+            rank = combined.groupby(_STRATUM, dropna=False)[_KEY].rank(method="first")
+            combined = combined[rank <= k]
+
+        reservoir = combined.reset_index(drop=True)
+
+    if reservoir is None:
+        return pd.read_csv(features_csv, usecols=_usecols(columns), nrows=0)
+
+    if mode == "stratified":
+        alloc = _allocate(counts, k)
+        rank = reservoir.groupby(_STRATUM, dropna=False)[_KEY].rank(method="first")
+        reservoir = reservoir[rank <= reservoir[_STRATUM].map(alloc).fillna(0)]
+
+    out = reservoir.sort_values(_POS).drop(columns=[_KEY, _POS, _STRATUM], errors="ignore")
+    if extra is not None and extra not in columns:
+        out = out.drop(columns=[extra])
+    return out.reset_index(drop=True)
+
+
+def load_rows_for_users(
+    features_csv: str,
+    columns: Sequence[str],
+    user_ids: Sequence[int],
+    chunksize: int = 100_000,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    Read the rows of `user_ids` (in that order) from the features CSV.
+    """
+    wanted = pd.Index(np.asarray(user_ids, dtype="int64"), name="User ID")
+    parts = []
+    reader = pd.read_csv(
+        features_csv,
+        usecols=_usecols(list(columns) + ["User ID"]),
+        chunksize=chunksize,
+        dtype=_dtypes(columns, dtype),
+        low_memory=False,
+    )
+    for chunk in reader:
+        parts.append(chunk[chunk["User ID"].astype("int64").isin(wanted)])
+
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["User ID"])
+    df["User ID"] = df["User ID"].astype("int64")
+    df = df.drop_duplicates(subset=["User ID"]).set_index("User ID")
+
+    missing = wanted.difference(df.index)
+    if len(missing):
+        raise ValueError(f"{len(missing)} sampled users are missing from {features_csv} (e.g. {list(missing[:5])})")
+
+    return df.reindex(wanted).reset_index()
+
+
+def load_linkage_rows(
+    features_csv: str,
+    columns: Sequence[str],
+    linkage_npy: str,
+    max_rows: int | None,
+    dtype: str | None = None,
+) -> pd.DataFrame:
+    """
+    Feature rows aligned with the rows of a linkage matrix.
+
+    Uses the User IDs persisted by compute_linkage; linkages written before
+    sampling existed fall back to the first `max_rows` rows.
+    """
+    ids_npy = user_ids_path(linkage_npy)
+    if ids_npy.exists():
+        return load_rows_for_users(features_csv, columns, np.load(ids_npy), dtype=dtype)
+    return sample_features(features_csv, columns, max_rows, mode="head", dtype=dtype)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from fp.io import save_json
+
+
+class MomentAccumulator:
+    """
+    Streaming count / mean / co-moment matrix over row blocks.
+
+    Each block contributes its centred Gram matrix (one BLAS call); blocks are
+    combined with Chan's pairwise update, so the result equals a single pass
+    over all rows without holding them.
+    """
+
+    def __init__(self, n_cols: int):
+        self.n = 0
+        self.mean = np.zeros(n_cols)
+        self.comoment = np.zeros((n_cols, n_cols))
+
+    def update(self, X: np.ndarray) -> "MomentAccumulator":
+        X = np.asarray(X, dtype=np.float64)
+        n_b = len(X)
+        if n_b == 0:
+            return self
+        mean_b = X.mean(axis=0)
+        Xc = X - mean_b
+        c_b = Xc.T @ Xc
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.comoment += c_b + np.outer(delta, delta) * (self.n * n_b / n)
+        self.mean += delta * (n_b / n)
+        self.n = n
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        return np.diag(self.comoment) / self.n
+
+    def correlation(self) -> np.ndarray:
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.comoment / np.outer(std, std)
+        corr[~np.isfinite(corr)] = 0.0
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+
+def _numeric_columns(features_csv: str, columns: Optional[Sequence[str]]) -> List[str]:
+    head = pd.read_csv(features_csv, nrows=1000)
+    if columns:
+        missing = [c for c in columns if c not in head.columns]
+        if missing:
+            raise ValueError(f"Missing required columns in features: {missing}")
+        return list(columns)
+    return [c for c in head.columns if c != "User ID" and pd.api.types.is_numeric_dtype(head[c])]
+
+
+def reduce_collinear(corr: np.ndarray, columns: List[str], keep: np.ndarray, threshold: float) -> List[dict]:
+    """
+    Greedy pruning: while two kept columns have |corr| >= threshold, drop the
+    one more correlated (mean |corr|) with the remaining columns. Updates
+    `keep` in place and returns the drops with the partner that caused them.
+    """
+    dropped = []
+    a = np.abs(corr)
+    np.fill_diagonal(a, 0.0)
+    while True:
+        idx = np.flatnonzero(keep)
+        if len(idx) < 2:
+            return dropped
+        sub = a[np.ix_(idx, idx)]
+        i, j = np.unravel_index(np.argmax(sub), sub.shape)
+        if sub[i, j] < threshold:
+            return dropped
+        mean_abs = sub.sum(axis=1) / (len(idx) - 1)
+        drop, partner = (i, j) if mean_abs[i] >= mean_abs[j] else (j, i)
+        keep[idx[drop]] = False
+        dropped.append({
+            "column": columns[idx[drop]],
+            "reason": "collinear",
+            "partner": columns[idx[partner]],
+            "corr": float(corr[idx[drop], idx[partner]]),
+        })
+
+
+def screen_features(
+    features_csv: str,
+    out_json: str | None = None,
+    columns: Optional[Sequence[str]] = None,
+    corr_threshold: float = 0.9,
+    constant_tol: float = 1e-3,
+    chunksize: int = 100_000,
+) -> dict:
+    """
+    One streaming pass over the features CSV: per-column mean / std and the
+    full correlation matrix (missing values read as 0, like fp linkage).
+
+    Near-constant columns (std <= constant_tol * max(|mean|, 1)) are dropped
+    first, then collinear ones (see reduce_collinear). The result, including
+    suggested_columns, is written to out_json for `fp linkage --screen`.
+    """
+    if not 0.0 < corr_threshold <= 1.0:
+        raise ValueError(f"corr_threshold must be in (0, 1], got {corr_threshold}")
+    cols = _numeric_columns(features_csv, columns)
+    if not cols:
+        raise ValueError(f"No numeric feature columns in {features_csv}")
+
+    acc = MomentAccumulator(len(cols))
+    for chunk in pd.read_csv(features_csv, usecols=cols, chunksize=chunksize):
+        acc.update(chunk[cols].apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy(dtype=np.float64))
+    if acc.n == 0:
+        raise ValueError(f"{features_csv} has no rows")
+
+    std = np.sqrt(acc.variance)
+    corr = acc.correlation()
+    near_constant = std <= constant_tol * np.maximum(np.abs(acc.mean), 1.0)
+
+    keep = ~near_constant
+    dropped = [{"column": c, "reason": "near_constant"} for c, nc in zip(cols, near_constant) if nc]
+    dropped += reduce_collinear(corr, cols, keep, corr_threshold)
+
+    iu = np.triu_indices(len(cols), k=1)
+    pairs = [
+        {"a": cols[i], "b": cols[j], "corr": float(corr[i, j])}
+        for i, j in zip(*iu)
+        if abs(corr[i, j]) >= corr_threshold and not (near_constant[i] or near_constant[j])
+    ]
+
+    result = {
+        "features_csv": features_csv,
+        "n_rows": int(acc.n),
+        "corr_threshold": corr_threshold,
+        "constant_tol": constant_tol,
+        "columns": [
+            {"column": c, "mean": float(m), "std": float(s), "near_constant": bool(nc)}
+            for c, m, s, nc in zip(cols, acc.mean, std, near_constant)
+        ],
+        "collinear_pairs": sorted(pairs, key=lambda p: -abs(p["corr"])),
+        "dropped": dropped,
+        "suggested_columns": [c for c, k in zip(cols, keep) if k],
+        "correlation": {"columns": cols, "matrix": np.round(corr, 6).tolist()},
+    }
+    if out_json:
+        save_json(result, out_json)
+    return result
+
+
+def screened_columns(screen_json: str | Path, feature_cols: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Columns to cluster on from an `fp screen` result: its suggestion, or the
+    given feature_cols minus those it dropped.
+    """
+    result = json.loads(Path(screen_json).read_text(encoding="utf-8"))
+    if not feature_cols:
+        return list(result["suggested_columns"])
+    dropped = {d["column"] for d in result["dropped"]}
+    return [c for c in feature_cols if c not in dropped]
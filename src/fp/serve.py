@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class RunIndex:
+    """
+    Compact user -> cluster index of one run directory.
+
+    User IDs are kept as a sorted int64 array (binary search lookups);
+    centroids are kept in the run's clustering space: standardised with the
+    run_meta.json scaler, or raw for runs recorded with "scaled": false.
+    """
+    name: str
+    run_dir: str
+    user_ids: np.ndarray
+    clusters: np.ndarray
+    feature_cols: List[str]
+    centroid_clusters: Optional[np.ndarray] = None
+    centroids: Optional[np.ndarray] = None
+    mean: Optional[np.ndarray] = None
+    scale: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(cls, run_dir: str, name: str | None = None) -> "RunIndex":
+        run = Path(run_dir)
+        users = pd.read_csv(run / "clustered_users.csv", usecols=["User ID", "Cluster"])
+        ids = users["User ID"].to_numpy(dtype="int64")
+        order = np.argsort(ids, kind="stable")
+
+        meta_path = run / "run_meta.json"
+        meta = json.loads(meta_path.read_text(encoding="utf-8")) if meta_path.exists() else {}
+        feature_cols = list(meta.get("feature_cols", []))
+
+        centroid_clusters = centroids = mean = scale = None
+        means_path = run / "cluster_means.csv"
+        scaler = meta.get("scaler")
+        if feature_cols and scaler and means_path.exists():
+            means = pd.read_csv(means_path)
+            mean = np.asarray(scaler["mean"], dtype="float64")
+            scale = np.asarray(scaler["scale"], dtype="float64")
+            if not meta.get("scaled", True):
+                mean, scale = np.zeros_like(mean), np.ones_like(scale)
+            centroid_clusters = means["Cluster"].to_numpy(dtype="int64")
+            centroids = (means[feature_cols].to_numpy(dtype="float64") - mean) / scale
+
+        return cls(
+            name=name or run.name,
+            run_dir=str(run),
+            user_ids=ids[order],
+            clusters=users["Cluster"].to_numpy(dtype="int32")[order],
+            feature_cols=feature_cols,
+            centroid_clusters=centroid_clusters,
+            centroids=centroids,
+            mean=mean,
+            scale=scale,
+        )
+
+    @property
+    def can_assign(self) -> bool:
+        return self.centroids is not None
+
+    def lookup(self, user_ids) -> np.ndarray:
+        """
+        Cluster per user ID; -1 for users not in the run.
+        """
+        q = np.asarray(user_ids, dtype="int64")
+        if len(self.user_ids) == 0:
+            return np.full(len(q), -1, dtype="int32")
+        pos = np.minimum(np.searchsorted(self.user_ids, q), len(self.user_ids) - 1)
+        return np.where(self.user_ids[pos] == q, self.clusters[pos], -1)
+
+    def assign(self, X) -> np.ndarray:
+        """
+        Nearest-centroid cluster for raw feature rows (columns in feature_cols order).
+        """
+        if not self.can_assign:
+            raise ValueError(f"Run {self.name!r} has no centroids/scaler; cannot assign new users")
+        Xs = (np.asarray(X, dtype="float64") - self.mean) / self.scale
+        d2 = ((Xs[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+        return self.centroid_clusters[np.argmin(d2, axis=1)]
+
+
+class LatencyMetrics:
+    """
+    Request counts and latency percentiles over the last `window` requests per route.
+    """
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._window = window
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._latencies.setdefault(route, deque(maxlen=self._window)).append(seconds)
+            self._counts[route] = self._counts.get(route, 0) + 1
+            if not ok:
+                self._errors[route] = self._errors.get(route, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {r: np.asarray(v) for r, v in self._latencies.items()}
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+        out = {}
+        for route, lat in routes.items():
+            ms = lat * 1000.0
+            out[route] = {
+                "count": counts[route],
+                "errors": errors.get(route, 0),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+            }
+        return out
+
+
+class SegmentService:
+    """
+    Holds the loaded run indexes. Reloads build new indexes first and swap the
+    whole mapping in one assignment, so requests never see a half-loaded state.
+    """
+
+    def __init__(self, run_dirs: List[str]):
+        self.run_dirs = list(run_dirs)
+        self.metrics = LatencyMetrics()
+        self._reload_lock = threading.Lock()
+        self.indexes: Dict[str, RunIndex] = self._load(self.run_dirs)
+
+    @staticmethod
+    def _load(run_dirs: List[str]) -> Dict[str, RunIndex]:
+        if not run_dirs:
+            raise ValueError("Provide at least one run directory")
+        indexes = {}
+        for run_dir in run_dirs:
+            idx = RunIndex.load(run_dir)
+            if idx.name in indexes:
+                raise ValueError(
+                    f"Duplicate run name {idx.name!r} ({indexes[idx.name].run_dir}, {run_dir}); "
+                    "runs are keyed by directory name"
+                )
+            indexes[idx.name] = idx
+        return indexes
+
+    def reload(self, run_dirs: List[str] | None = None) -> List[str]:
+        with self._reload_lock:
+            run_dirs = list(run_dirs) if run_dirs else self.run_dirs
+            new = self._load(run_dirs)
+            self.indexes, self.run_dirs = new, run_dirs
+            return list(new)
+
+    def get(self, run: str | None) -> RunIndex:
+        indexes = self.indexes
+        if run is None:
+            return next(iter(indexes.values()))
+        if run not in indexes:
+            raise KeyError(f"Unknown run: {run!r}")
+        return indexes[run]
+
+    def describe(self) -> dict:
+        return {
+            name: {
+                "run_dir": idx.run_dir,
+                "n_users": int(len(idx.user_ids)),
+                "n_clusters": int(len(np.unique(idx.clusters))),
+                "feature_cols": idx.feature_cols,
+                "can_assign": idx.can_assign,
+            }
+            for name, idx in self.indexes.items()
+        }
+
+
+ROUTES = {
+    ("GET", "/health"),
+    ("GET", "/runs"),
+    ("GET", "/metrics"),
+    ("GET", "/lookup"),
+    ("POST", "/lookup"),
+    ("POST", "/assign"),
+    ("POST", "/reload"),
+}
+
+
+def _cluster_or_none(c: int):
+    return None if c < 0 else int(c)
+
+
+def _field(params: dict, key: str):
+    """
+    A required request field; missing ones are a bad request (400), not 404.
+    """
+    if key not in params:
+        raise ValueError(f"Missing field: {key!r}")
+    return params[key]
+
+
+def _feature_rows(rows: list, feature_cols: List[str]) -> list:
+    if not isinstance(rows, list):
+        raise ValueError("features must be a list of rows")
+    if not rows or not isinstance(rows[0], dict):
+        return rows
+    missing = sorted({c for r in rows for c in feature_cols if c not in r})
+    if missing:
+        raise ValueError(f"Missing features: {missing}")
+    return [[r[c] for c in feature_cols] for r in rows]
+
+
+def _make_handler(service: SegmentService):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # keep the terminal quiet
+            pass
+
+        def _send(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object")
+            return body
+
+        def _dispatch(self, method: str) -> None:
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            # unknown paths share one metrics key, so clients cannot grow it without bound
+            route = f"{method} {url.path}" if (method, url.path) in ROUTES else f"{method} <unknown>"
+            status = 500
+            try:
+                status, body = self._route(method, url.path, parse_qs(url.query))
+            except KeyError as e:
+                status, body = 404, {"error": str(e.args[0]) if e.args else "not found"}
+            except (ValueError, TypeError) as e:
+                status, body = 400, {"error": str(e)}
+            except Exception as e:
+                status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+            finally:
+                service.metrics.record(route, time.perf_counter() - start, ok=status < 400)
+            self._send(status, body)
+
+        def _route(self, method: str, path: str, query: dict):
+            if method == "GET" and path == "/health":
+                return 200, {"status": "ok", "runs": list(service.indexes)}
+            if method == "GET" and path == "/runs":
+                return 200, service.describe()
+            if method == "GET" and path == "/metrics":
+                return 200, service.metrics.snapshot()
+            if method == "GET" and path == "/lookup":
+                idx = service.get(query.get("run", [None])[0])
+                user_id = int(_field(query, "user_id")[0])
+                cluster = int(idx.lookup([user_id])[0])
+                if cluster < 0:
+                    return 404, {"run": idx.name, "user_id": user_id, "cluster": None}
+                return 200, {"run": idx.name, "user_id": user_id, "cluster": cluster}
+            if method == "POST" and path == "/lookup":
+                body = self._body()
+                idx = service.get(body.get("run"))
+                user_ids = [int(u) for u in _field(body, "user_ids")]
+                clusters = idx.lookup(user_ids)
+                return 200, {
+                    "run": idx.name,
+                    "user_ids": user_ids,
+                    "clusters": [_cluster_or_none(c) for c in clusters],
+                }
+            if method == "POST" and path == "/assign":
+                body = self._body()
+                idx = service.get(body.get("run"))
+                rows = _feature_rows(_field(body, "features"), idx.feature_cols)
+                return 200, {"run": idx.name, "clusters": [int(c) for c in idx.assign(rows)]}
+            if method == "POST" and path == "/reload":
+                body = self._body()
+                runs = service.reload(body.get("run_dirs"))
+                return 200, {"status": "reloaded", "runs": runs}
+            raise KeyError(f"No route for {method} {path}")
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+def make_server(run_dirs: List[str], host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    service = SegmentService(run_dirs)
+    server = ThreadingHTTPServer((host, port), _make_handler(service))
+    server.service = service
+    return server
+
+
+def serve(run_dirs: List[str], host: str = "127.0.0.1", port: int = 8765) -> None:
+    server = make_server(run_dirs, host=host, port=port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
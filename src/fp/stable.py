@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from fp.delta import load_assignments
+
+
+def _assign(cost: np.ndarray, new_ids: np.ndarray, ref_ids: np.ndarray, allowed: np.ndarray) -> dict:
+    """
+    Optimal one-to-one matching on a [new x ref] cost matrix, keeping only
+    pairs marked in `allowed`; new clusters left over (more clusters than the
+    reference, or no acceptable partner) get fresh ids above every reference id.
+    """
+    rows, cols = linear_sum_assignment(cost)
+    mapping = {int(new_ids[r]): int(ref_ids[c]) for r, c in zip(rows, cols) if allowed[r, c]}
+    next_id = int(ref_ids.max()) + 1 if len(ref_ids) else 1
+    for cl in new_ids:
+        if int(cl) not in mapping:
+            mapping[int(cl)] = next_id
+            next_id += 1
+    return mapping
+
+
+def match_by_centroids(
+    new_ids: np.ndarray,
+    new_means: np.ndarray,
+    ref_ids: np.ndarray,
+    ref_means: np.ndarray,
+    scale: np.ndarray,
+    max_distance: Optional[float] = None,
+) -> tuple:
+    """
+    (mapping new -> reference id, matched distances) minimising the total
+    Euclidean distance between raw-feature centroids divided by `scale`.
+
+    Pairs further apart than max_distance (default sqrt(n features), i.e. one
+    std per feature on average) are not matched: such a cluster is new and
+    gets a fresh id instead of inheriting an unrelated one.
+    """
+    a = np.asarray(new_means, dtype=np.float64) / scale
+    b = np.asarray(ref_means, dtype=np.float64) / scale
+    dist = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+    if max_distance is None:
+        max_distance = float(np.sqrt(a.shape[1]))
+    mapping = _assign(dist, new_ids, ref_ids, dist <= max_distance)
+    ref_pos = {int(c): j for j, c in enumerate(ref_ids)}
+    distances = {
+        new: float(dist[i, ref_pos[mapping[new]]]) if mapping[new] in ref_pos else None
+        for i, new in enumerate(int(c) for c in new_ids)
+    }
+    return mapping, distances
+
+
+def match_by_overlap(
+    user_ids: np.ndarray,
+    clusters: np.ndarray,
+    ref_user_ids: np.ndarray,
+    ref_clusters: np.ndarray,
+) -> tuple:
+    """
+    (mapping new -> reference id, shared users per match) maximising the
+    number of users that keep their segment. Both id arrays must be sorted.
+    Clusters sharing no users with their best partner get fresh ids.
+    """
+    shared, i_new, i_ref = np.intersect1d(user_ids, ref_user_ids, assume_unique=True, return_indices=True)
+    if len(shared) == 0:
+        raise ValueError("The reference run shares no users with this run; cannot match by overlap")
+    new_ids, new_pos = np.unique(clusters, return_inverse=True)
+    ref_ids, ref_pos = np.unique(ref_clusters, return_inverse=True)
+    counts = np.zeros((len(new_ids), len(ref_ids)), dtype=np.int64)
+    np.add.at(counts, (new_pos[i_new], ref_pos[i_ref]), 1)
+    mapping = _assign(-counts, new_ids, ref_ids, counts > 0)
+    ref_index = {int(c): j for j, c in enumerate(ref_ids)}
+    overlap = {
+        int(new): int(counts[i, ref_index[mapping[int(new)]]]) if mapping[int(new)] in ref_index else 0
+        for i, new in enumerate(new_ids)
+    }
+    return mapping, overlap
+
+
+def stable_mapping(
+    reference_dir: str,
+    feature_cols: List[str],
+    user_ids: np.ndarray,
+    clusters: np.ndarray,
+    X: pd.DataFrame,
+    scale: Optional[np.ndarray] = None,
+) -> dict:
+    """
+    Map this run's clusters onto the cluster ids of reference_dir.
+
+    With the same feature columns, clusters are matched by optimal assignment
+    on centroid distances (raw means standardised by this run's std);
+    otherwise, or when the reference has no cluster_means.csv, by member
+    overlap. Returns the run_meta.json record; "mapping" is new -> stable id.
+    """
+    ref = Path(reference_dir)
+    ref_meta_path = ref / "run_meta.json"
+    ref_meta = json.loads(ref_meta_path.read_text(encoding="utf-8")) if ref_meta_path.exists() else {}
+    means_path = ref / "cluster_means.csv"
+    clusters = np.asarray(clusters)
+    new_ids = np.unique(clusters)
+
+    if ref_meta.get("feature_cols") == list(feature_cols) and means_path.exists():
+        ref_means = pd.read_csv(means_path).sort_values("Cluster")
+        ref_ids = ref_means["Cluster"].to_numpy()
+        new_means = X[feature_cols].groupby(clusters).mean().loc[new_ids].to_numpy()
+        if scale is None:
+            scale = X[feature_cols].std(axis=0, ddof=0).replace(0.0, 1.0).to_numpy()
+        mapping, scores = match_by_centroids(new_ids, new_means, ref_ids, ref_means[feature_cols].to_numpy(), scale)
+        method, score_key = "centroid", "distance"
+    else:
+        ids = np.asarray(user_ids, dtype=np.int64)
+        by_id = np.argsort(ids, kind="stable")
+        ref_user_ids, ref_clusters = load_assignments(ref)
+        ref_ids = np.unique(ref_clusters)
+        mapping, scores = match_by_overlap(ids[by_id], clusters[by_id], ref_user_ids, ref_clusters)
+        method, score_key = "overlap", "shared_users"
+
+    known = set(int(c) for c in ref_ids)
+    return {
+        "reference": str(reference_dir),
+        "method": method,
+        "mapping": {str(k): v for k, v in sorted(mapping.items())},
+        "matches": [{"cluster": k, "stable_id": mapping[k], score_key: scores[k]} for k in sorted(mapping)],
+        "new_ids": sorted(v for v in mapping.values() if v not in known),
+    }
+
+
+def relabel(clusters: np.ndarray, mapping: dict) -> np.ndarray:
+    """
+    Apply a new -> stable id mapping (keys may be str, as stored in JSON).
+    """
+    keys = np.array([int(k) for k in mapping], dtype=np.int64)
+    values = np.array(list(mapping.values()), dtype=np.int64)
+    order = np.argsort(keys)
+    pos = np.searchsorted(keys[order], clusters)
+    return values[order][pos]
@@ -28,6 +28,23 @@ def map_tags_to_clusters(tag_cell: str, mapping: Dict[str, str]) -> List[str]:
     return out
 
 
+def provider_tag_clusters(
+    tags_df: pd.DataFrame,
+    tag_mapping: Dict[str, str],
+    provider_id_col: str = "Provider ID",
+    provider_tag_col: str = "Provider Tag",
+) -> pd.DataFrame:
+    """
+    One row per (provider, tag cluster) pair: the exploded "Tag Clusters" column.
+    """
+    tags = tags_df.dropna(subset=[provider_tag_col]).copy()
+    tags[provider_tag_col] = tags[provider_tag_col].apply(clean_emojis)
+
+    tags["Tag Clusters"] = tags[provider_tag_col].apply(lambda s: map_tags_to_clusters(s, tag_mapping))
+    exploded = tags.explode("Tag Clusters")
+    return exploded[exploded["Tag Clusters"].notna()]
+
+
 def build_user_tag_cluster_percentages(
     tags_df: pd.DataFrame,
     orders_df: pd.DataFrame,
@@ -40,13 +57,7 @@ def build_user_tag_cluster_percentages(
     Produces a wide df indexed by User ID with columns like 'asian','georgian',...
     values are percentage of tag-clusters across that user's orders/providers.
     """
-    tags = tags_df.copy()
-    tags = tags.dropna(subset=[provider_tag_col])
-    tags[provider_tag_col] = tags[provider_tag_col].apply(clean_emojis)
-
-    tags["Tag Clusters"] = tags[provider_tag_col].apply(lambda s: map_tags_to_clusters(s, tag_mapping))
-    exploded = tags.explode("Tag Clusters")
-    exploded = exploded[exploded["Tag Clusters"].notna()]
+    exploded = provider_tag_clusters(tags_df, tag_mapping, provider_id_col, provider_tag_col)
 
     merged = exploded.merge(
         orders_df[[provider_id_col, user_id_col]],
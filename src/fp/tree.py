@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+from fp.io import sidecar_path
+
+
+def tree_path(linkage_npy: str | Path) -> Path:
+    """
+    Where the condensed tree of a linkage is stored.
+    """
+    return sidecar_path(linkage_npy, ".tree.npz")
+
+
+def build_condensed_tree(Z: np.ndarray, X: np.ndarray, feature_cols: List[str]) -> dict:
+    """
+    Merge heights, sizes and per-node feature means of a linkage matrix.
+
+    Node n + i is the cluster formed by row i of Z. Means are computed
+    bottom-up in one pass over Z from running feature sums (accumulated in
+    float64, stored in X's float dtype).
+    """
+    X = np.asarray(X)
+    n = X.shape[0]
+    if Z.shape[0] != n - 1:
+        raise ValueError(f"Linkage has {Z.shape[0] + 1} leaves but X has {n} rows")
+
+    children = Z[:, :2].astype(np.int64)
+    sums = np.empty((2 * n - 1, X.shape[1]), dtype=np.float64)
+    sums[:n] = X
+    for i, (a, b) in enumerate(children):
+        sums[n + i] = sums[a] + sums[b]
+
+    out_dtype = X.dtype if X.dtype.kind == "f" else np.dtype(np.float64)
+    sizes = Z[:, 3].astype(np.int64)
+    return {
+        "n_leaves": np.int64(n),
+        "children": children,
+        "heights": Z[:, 2].astype(out_dtype),
+        "sizes": sizes,
+        "means": (sums[n:] / sizes[:, None]).astype(out_dtype),
+        "feature_cols": np.asarray(feature_cols, dtype=str),
+    }
+
+
+def save_tree(tree: dict, path: str | Path) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **tree)
+
+
+def load_tree(path: str | Path) -> dict:
+    with np.load(path) as data:
+        tree = {k: data[k] for k in data.files}
+    tree["n_leaves"] = int(tree["n_leaves"])
+    tree["feature_cols"] = [str(c) for c in tree["feature_cols"]]
+    return tree
+
+
+def dendrogram_frames(tree: dict, p: int = 50) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Layout of the top `p` clusters (like scipy's truncate_mode="lastp").
+
+    Returns (segments, nodes): segments are the dendrogram lines
+    (x, y, x2, y2); nodes hold one row per drawn node with its height,
+    size and feature means (NaN for single users) for hover profiles.
+    """
+    n = tree["n_leaves"]
+    children, heights, sizes, means = tree["children"], tree["heights"], tree["sizes"], tree["means"]
+    feature_cols = tree["feature_cols"]
+    p = max(1, min(int(p), n))
+    first_visible = n + (n - 1) - (p - 1)  # merges at or above this node id are drawn
+
+    def is_visible(node: int) -> bool:
+        return node >= first_visible
+
+    root = 2 * n - 2
+    x_of: dict = {}
+    order: List[int] = []
+    stack = [(root, False)]
+    # Iterative post-order: truncated leaves get x = 0..p-1, internal nodes sit between children
+    while stack:
+        node, expanded = stack.pop()
+        if node < n or not is_visible(node):
+            x_of[node] = float(len(order))
+            order.append(node)
+            continue
+        a, b = children[node - n]
+        if expanded:
+            x_of[node] = (x_of[a] + x_of[b]) / 2.0
+        else:
+            stack.extend([(node, True), (b, False), (a, False)])
+
+    def node_row(node: int, y: float) -> dict:
+        row = {"node": node, "x": x_of[node], "y": y}
+        if node < n:
+            row.update({"size": 1, "merge_height": 0.0})
+            row.update({c: np.nan for c in feature_cols})
+        else:
+            i = node - n
+            row.update({"size": int(sizes[i]), "merge_height": float(heights[i])})
+            row.update({c: float(v) for c, v in zip(feature_cols, means[i])})
+        return row
+
+    segments, nodes = [], []
+    for node in order:
+        nodes.append(node_row(node, 0.0))
+    for node in range(first_visible, root + 1):
+        h = float(heights[node - n])
+        a, b = children[node - n]
+        ya = float(heights[a - n]) if is_visible(a) else 0.0
+        yb = float(heights[b - n]) if is_visible(b) else 0.0
+        segments.append({"x": x_of[a], "y": ya, "x2": x_of[a], "y2": h})
+        segments.append({"x": x_of[a], "y": h, "x2": x_of[b], "y2": h})
+        segments.append({"x": x_of[b], "y": yb, "x2": x_of[b], "y2": h})
+        nodes.append(node_row(node, h))
+
+    return pd.DataFrame(segments, columns=["x", "y", "x2", "y2"]), pd.DataFrame(nodes)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.optimize import linear_sum_assignment
+from sklearn.metrics import adjusted_rand_score
+
+from fp.io import save_json
+from fp.linkage import scale_features
+from fp.sampling import sample_features
+
+
+def matched_agreement(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Share of users with the same cluster after optimally matching b's labels to a's.
+    """
+    table = pd.crosstab(a, b).to_numpy()
+    rows, cols = linear_sum_assignment(-table)
+    return float(table[rows, cols].sum() / len(a))
+
+
+def validate_float32(
+    features_csv: str,
+    feature_cols: List[str],
+    out_json: str,
+    cut_distance: Optional[float] = None,
+    n_clusters: Optional[int] = None,
+    method: str = "ward",
+    scale: bool = True,
+    max_rows: int | None = 40000,
+    sample: str = "head",
+    seed: int = 0,
+    stratify_col: Optional[str] = None,
+    stratify_bins: Optional[List[float]] = None,
+) -> dict:
+    """
+    Run scaling -> linkage -> cut in float64 and float32 on the same users
+    and report how far the cluster assignments and merge heights drift.
+    """
+    if (cut_distance is None) == (n_clusters is None):
+        raise ValueError("Provide exactly one: cut_distance OR n_clusters")
+
+    needed = ["User ID"] + feature_cols
+    df = sample_features(
+        features_csv, needed, max_rows, mode=sample, seed=seed, stratify_col=stratify_col, stratify_bins=stratify_bins
+    )
+    missing = [c for c in needed if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns in features: {missing}")
+    X = df[feature_cols].fillna(0.0)
+
+    results = {}
+    for dtype in ("float64", "float32"):
+        Xv = scale_features(X, scale=scale, dtype=dtype)
+        Z = linkage(Xv, method=method).astype(dtype)
+        Zc = Z.astype(np.float64)
+        if cut_distance is not None:
+            labels = fcluster(Zc, t=float(cut_distance), criterion="distance")
+        else:
+            labels = fcluster(Zc, t=int(n_clusters), criterion="maxclust")
+        results[dtype] = {"X": Xv, "Z": Z, "labels": labels}
+
+    l64, l32 = results["float64"]["labels"], results["float32"]["labels"]
+    h64 = results["float64"]["Z"][:, 2]
+    h32 = results["float32"]["Z"][:, 2].astype(np.float64)
+
+    report = {
+        "features_csv": features_csv,
+        "feature_cols": feature_cols,
+        "n_users": int(len(df)),
+        "method": method,
+        "cut_distance": cut_distance,
+        "n_clusters": n_clusters,
+        "n_clusters_float64": int(len(np.unique(l64))),
+        "n_clusters_float32": int(len(np.unique(l32))),
+        "adjusted_rand_index": float(adjusted_rand_score(l64, l32)),
+        "matched_agreement": matched_agreement(l64, l32),
+        "identical_merge_order": bool(np.array_equal(results["float64"]["Z"][:, :2], results["float32"]["Z"][:, :2].astype(np.float64))),
+        "max_abs_height_diff": float(np.max(np.abs(h64 - h32))) if len(h64) else 0.0,
+        "max_rel_height_diff": float(np.max(np.abs(h64 - h32) / np.maximum(np.abs(h64), 1e-12))) if len(h64) else 0.0,
+        "matrix_bytes_float64": int(results["float64"]["X"].nbytes + results["float64"]["Z"].nbytes),
+        "matrix_bytes_float32": int(results["float32"]["X"].nbytes + results["float32"]["Z"].nbytes),
+    }
+    save_json(report, out_json)
+    return report
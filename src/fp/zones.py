@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import pandas as pd
+
+from fp.cluster import cut_clusters
+from fp.features import build_features_frame, dominant_zones, load_inputs, resolve_reference_date
+from fp.io import write_csv, save_json
+from fp.linkage import compute_linkage
+
+
+# Uncapped runs (every zone, or max_rows=None) above this many users get a
+# kNN-constrained Ward linkage instead of the O(n^2) full one
+FULL_WARD_MAX_ROWS = 40_000
+ZONE_KNN = 15
+
+
+def zone_slug(zone: str) -> str:
+    return re.sub(r"[^\w-]+", "_", str(zone)).strip("_") or "zone"
+
+
+def zone_dirs(zones: Sequence[str]) -> Dict[str, str]:
+    """
+    Directory name per zone. Zones whose slugs collide (also case-insensitively,
+    for case-insensitive filesystems) get _2, _3, ... in sorted zone order, so
+    parallel runs never share a directory.
+    """
+    out: Dict[str, str] = {}
+    taken = set()
+    for zone in sorted(zones):
+        slug = base = zone_slug(zone)
+        n = 1
+        while slug.lower() in taken:
+            n += 1
+            slug = f"{base}_{n}"
+        taken.add(slug.lower())
+        out[zone] = slug
+    return out
+
+
+def linkage_knn(n_users: int, max_rows: int | None) -> int | None:
+    """
+    knn for compute_linkage: None (full Ward) when the rows are capped or
+    few enough, else ZONE_KNN.
+    """
+    if max_rows or n_users <= FULL_WARD_MAX_ROWS:
+        return None
+    return ZONE_KNN
+
+
+def _run_segment(
+    name: str,
+    orders: pd.DataFrame,
+    zones: pd.DataFrame,
+    tags: pd.DataFrame,
+    run_dir: str,
+    feature_cols: List[str],
+    cluster_params: dict,
+    max_rows: int | None,
+    min_orders_per_user: int | None,
+    dtype: str,
+    reference_date,
+) -> dict:
+    """
+    features -> linkage -> cut for one partition, written under run_dir.
+    """
+    run = Path(run_dir)
+    features = build_features_frame(
+        orders, zones, tags, min_orders_per_user=min_orders_per_user, reference_date=reference_date
+    )
+    features_csv = str(run / "features.csv")
+    write_csv(features, features_csv)
+
+    n_users = len(features)
+    k = cluster_params.get("n_clusters")
+    if n_users < 3 or (k is not None and n_users < k):
+        return {"Zone": name, "Run Dir": str(run), "Users": n_users, "Clusters": 0, "Status": "skipped (too few users)"}
+
+    linkage_npy = str(run / "linkage.npy")
+    knn = linkage_knn(n_users, max_rows)
+    compute_linkage(
+        features_csv=features_csv,
+        feature_cols=feature_cols,
+        out_npy=linkage_npy,
+        meta_json=str(run / "linkage_meta.json"),
+        max_rows=max_rows,
+        dtype=dtype,
+        knn=knn,
+    )
+    cut_clusters(
+        features_csv=features_csv,
+        linkage_npy=linkage_npy,
+        feature_cols=feature_cols,
+        out_dir=str(run),
+        max_rows=max_rows,
+        dtype=dtype,
+        linkage_meta=str(run / "linkage_meta.json"),
+        **cluster_params,
+    )
+    n_clusters = pd.read_csv(run / "cluster_summary.csv")["Cluster"].nunique()
+    status = "ok" if knn is None else f"ok (knn={knn} linkage)"
+    return {"Zone": name, "Run Dir": str(run), "Users": n_users, "Clusters": int(n_clusters), "Status": status}
+
+
+def run_segmentation(
+    orders_path: str | Sequence[str],
+    zones_path: str,
+    tags_path: str,
+    out_dir: str,
+    feature_cols: List[str],
+    data_dir: str | None = None,
+    by_zone: bool = False,
+    cut_distance: Optional[float] = None,
+    n_clusters: Optional[int] = None,
+    auto: bool = False,
+    max_rows: int | None = 40000,
+    min_orders_per_user: int | None = None,
+    max_workers: Optional[int] = None,
+    dtype: str = "float64",
+    reference_date: str | None = None,
+) -> pd.DataFrame:
+    """
+    End-to-end features -> linkage -> cluster from the raw exports.
+
+    by_zone=True assigns each user to their dominant Eater zone, splits the
+    orders accordingly and runs every zone in its own worker process with no
+    row cap (each zone's Ward problem is much smaller than the global one;
+    zones above FULL_WARD_MAX_ROWS users use a kNN-constrained linkage).
+    Writes <out_dir>/<zone>/... per zone, plus zone_index.csv and a combined
+    clustered_users.csv with a "Zone:Cluster" Segment column.
+
+    All zones share one reference date for the recency features (the latest
+    order overall when not given).
+    """
+    cluster_params = {"cut_distance": cut_distance, "n_clusters": n_clusters, "auto": auto}
+    orders, zones, tags, ingest = load_inputs(orders_path, zones_path, tags_path, data_dir)
+    out = Path(out_dir)
+    reference_date = resolve_reference_date(orders, reference_date)
+
+    if not by_zone:
+        stats = _run_segment(
+            "all", orders, zones, tags, str(out), feature_cols, cluster_params, max_rows, min_orders_per_user, dtype, reference_date
+        )
+        return pd.DataFrame([stats])
+
+    user_zone = dominant_zones(zones)
+    order_zone = orders["User ID"].map(user_zone)
+    zone_zone = zones["User ID"].map(user_zone)
+
+    dirs = zone_dirs(user_zone.unique())
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for zone in sorted(dirs):
+            futures.append(pool.submit(
+                _run_segment,
+                zone,
+                orders[order_zone == zone],
+                zones[zone_zone == zone],
+                tags,
+                str(out / dirs[zone]),
+                feature_cols,
+                cluster_params,
+                None,
+                min_orders_per_user,
+                dtype,
+                reference_date,
+            ))
+        for f in futures:
+            results.append(f.result())
+
+    index = pd.DataFrame(results, columns=["Zone", "Run Dir", "Users", "Clusters", "Status"])
+    write_csv(index, out / "zone_index.csv")
+    ok = index["Status"].str.startswith("ok")
+
+    combined = []
+    for _, row in index[ok].iterrows():
+        users = pd.read_csv(Path(row["Run Dir"]) / "clustered_users.csv")
+        users.insert(1, "Zone", row["Zone"])
+        combined.append(users)
+    if combined:
+        combined = pd.concat(combined, ignore_index=True)
+        combined["Segment"] = combined["Zone"].astype(str) + ":" + combined["Cluster"].astype(str)
+        write_csv(combined, out / "clustered_users.csv")
+
+    save_json(
+        {
+            "orders": ingest,
+            "zones": zones_path,
+            "tags": tags_path,
+            "feature_cols": feature_cols,
+            "by_zone": True,
+            "reference_date": str(reference_date),
+            **cluster_params,
+            "n_users_without_zone": int(order_zone.isna().groupby(orders["User ID"]).all().sum()),
+            "zone_runs": index.to_dict(orient="records"),
+        },
+        out / "zone_run_meta.json",
+    )
+    return index
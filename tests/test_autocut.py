@@ -0,0 +1,46 @@
+import numpy as np
+from scipy.cluster.hierarchy import linkage
+
+from fp.autocut import height_acceleration, pick_gap_k, within_dispersion
+
+
+def test_height_acceleration_finds_three_blobs():
+    rng = np.random.default_rng(0)
+    X = np.vstack([c + rng.normal(scale=0.2, size=(30, 2)) for c in ([0, 0], [8, 0], [0, 8])])
+    accel = height_acceleration(linkage(X, method="ward"), list(range(2, 8)))
+    assert max(accel, key=accel.get) == 3
+
+
+def test_within_dispersion_matches_definition():
+    X = np.array([[0.0], [2.0], [10.0], [14.0]])
+    assert np.isclose(within_dispersion(X, np.array([1, 1, 2, 2])), 2.0 + 8.0)
+
+
+def test_pick_gap_k_uses_one_sd_rule():
+    scores = {2: {"gap": 1.0, "gap_sd": 0.1}, 3: {"gap": 1.05, "gap_sd": 0.1}, 4: {"gap": 2.0, "gap_sd": 0.1}}
+    assert pick_gap_k(scores) == 2
+
+
+def test_auto_cut_references_follow_the_linkage_method(tmp_path):
+    import json
+
+    import pandas as pd
+
+    from fp.cluster import cut_clusters
+    from fp.linkage import compute_linkage
+
+    rng = np.random.default_rng(0)
+    X = np.vstack([c + rng.normal(scale=0.2, size=(30, 2)) for c in ([0, 0], [8, 0], [0, 8])])
+    pd.DataFrame({"User ID": np.arange(90), "a": X[:, 0], "b": X[:, 1]}).to_csv(tmp_path / "features.csv", index=False)
+
+    for name, kwargs in {"average": {"method": "average"}, "knn": {"knn": 5}}.items():
+        run = tmp_path / name
+        run.mkdir()
+        compute_linkage(str(tmp_path / "features.csv"), ["a", "b"], str(run / "linkage.npy"), meta_json=str(run / "linkage_meta.json"), **kwargs)
+        cut_clusters(
+            str(tmp_path / "features.csv"), str(run / "linkage.npy"), ["a", "b"], str(run), auto=True,
+            k_max=5, gap_refs=2, n_jobs=1, embedding_dims=0, linkage_meta=str(run / "linkage_meta.json"),
+        )
+        auto = json.loads((run / "run_meta.json").read_text())["auto"]
+        assert auto["reference_method"] == kwargs.get("method", "ward")
+        assert ("kNN-constrained" in auto.get("note", "")) == (name == "knn")
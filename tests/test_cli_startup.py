@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEAVY = ("pandas", "scipy", "sklearn", "matplotlib")
+
+
+def _loaded_after(args):
+    code = (
+        "import sys\n"
+        f"sys.argv = ['fp'] + {args!r}\n"
+        "from fp.cli import app\n"
+        "try:\n"
+        "    app()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('HEAVY=' + ','.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return [l for l in out.stdout.splitlines() if l.startswith("HEAVY=")][-1][len("HEAVY="):]
+
+
+def test_help_does_not_import_heavy_dependencies():
+    assert _loaded_after(["--help"]) == ""
+    assert _loaded_after(["cluster", "--help"]) == ""
+
+
+def test_dendrogram_module_does_not_import_matplotlib():
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    code = "import sys, fp.dendrogram; print('matplotlib' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_every_command_has_a_startup_budget():
+    sys.path.insert(0, str(SRC.parent / "benchmarks"))
+    try:
+        from bench_import import COMMANDS
+    finally:
+        sys.path.pop(0)
+    from fp.cli import app
+
+    names = {c.name or c.callback.__name__ for c in app.registered_commands}
+    names |= {g.name for g in app.registered_groups}
+    assert names <= set(COMMANDS)
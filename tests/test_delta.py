@@ -0,0 +1,23 @@
+import numpy as np
+
+from fp.delta import ABSENT, diff_assignments, load_delta, save_assignments, write_delta
+
+
+def test_diff_lists_only_added_removed_and_moved_users():
+    old_ids, old_cl = np.array([1, 2, 3, 5]), np.array([1, 1, 2, 2])
+    new_ids, new_cl = np.array([2, 3, 4, 5]), np.array([1, 1, 3, 2])
+    d = diff_assignments(old_ids, old_cl, new_ids, new_cl)
+    assert d["user_ids"].tolist() == [1, 3, 4]
+    assert d["old"].tolist() == [1, 2, ABSENT]
+    assert d["new"].tolist() == [ABSENT, 1, 3]
+    assert (d["added"], d["removed"], d["changed"], d["unchanged"]) == (1, 1, 1, 2)
+
+
+def test_write_delta_against_baseline_run(tmp_path):
+    base, new = tmp_path / "base", tmp_path / "new"
+    base.mkdir(), new.mkdir()
+    save_assignments(base, np.array([30, 10, 20]), np.array([2, 1, 1]))
+    save_assignments(new, np.array([20, 10, 40]), np.array([2, 1, 1]))
+    counts = write_delta(new, base)
+    assert (counts["added"], counts["removed"], counts["changed"]) == (1, 1, 1)
+    assert load_delta(new)["Change"].tolist() == ["changed", "removed", "added"]
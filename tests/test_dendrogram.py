@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from fp.dendrogram import plot_dendrogram
+from fp.linkage import compute_linkage
+
+
+def test_dendrogram_plots_float32_linkage(tmp_path):
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(60, 2)), columns=["a", "b"])
+    features.insert(0, "User ID", np.arange(60))
+    features.to_csv(tmp_path / "features.csv", index=False)
+
+    compute_linkage(str(tmp_path / "features.csv"), ["a", "b"], str(tmp_path / "linkage.npy"), dtype="float32")
+    assert np.load(tmp_path / "linkage.npy").dtype == np.float32
+
+    out = plot_dendrogram(None, str(tmp_path / "linkage.npy"), out_png=str(tmp_path / "dendrogram.png"), truncate_p=10)
+    assert (tmp_path / "dendrogram.png").stat().st_size > 0
+    assert out == str(tmp_path / "dendrogram.png")
@@ -0,0 +1,40 @@
+import numpy as np
+
+from fp.embedding import compute_embedding, load_embedding_frame, randomized_pca, sample_per_cluster
+
+
+def test_randomized_pca_matches_exact_svd():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 6)) * np.array([5.0, 3.0, 1.0, 0.5, 0.2, 0.1])
+    mean, comps, ratio = randomized_pca(X, 2)
+    _, s, vt = np.linalg.svd(X - X.mean(axis=0), full_matrices=False)
+    assert np.allclose(np.abs(comps), np.abs(vt[:2]), atol=1e-6)
+    assert np.allclose(ratio, s[:2] ** 2 / (s ** 2).sum())
+
+
+def test_sample_per_cluster_caps_each_cluster():
+    clusters = np.r_[np.ones(100, int), np.full(5, 2)]
+    idx = sample_per_cluster(clusters, cap=10)
+    assert np.bincount(clusters[idx]).tolist() == [0, 10, 5]
+
+
+def test_embedding_roundtrip(tmp_path):
+    rng = np.random.default_rng(1)
+    Xs = rng.normal(size=(300, 4))
+    meta = compute_embedding(Xs, np.arange(300), np.arange(300) % 3 + 1, tmp_path / "embedding.npz", fit_rows=100, batch_size=64)
+    assert meta["n_components"] == 3
+    frame = load_embedding_frame(tmp_path / "embedding.npz", per_cluster=20)
+    assert list(frame.columns) == ["User ID", "Cluster", "PC1", "PC2", "PC3"]
+    assert frame.groupby("Cluster").size().tolist() == [20, 20, 20]
+
+
+def test_cli_rejects_unsupported_embedding_dims(tmp_path):
+    from typer.testing import CliRunner
+
+    from fp.cli import app
+
+    args = ["cluster", "--features", "f.csv", "--feature-cols", "AOV", "--out-dir", str(tmp_path), "--n-clusters", "3"]
+    result = CliRunner().invoke(app, args + ["--embedding-dims", "5"])
+    assert result.exit_code != 0
+    assert "--embedding-dims" in result.output
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from fp.engines import ENGINES, cluster_centroids, make_engine
+
+
+def _blobs():
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0], [10.0, 10.0], [0.0, 10.0]])
+    return np.vstack([c + rng.normal(scale=0.3, size=(50, 2)) for c in centers])
+
+
+@pytest.mark.parametrize("name", sorted(ENGINES))
+def test_engines_share_the_same_contract(name):
+    X = _blobs()
+    model = make_engine(name, n_clusters=3).fit(X)
+    assert model.labels_.shape == (150,)
+    assert model.labels_.min() >= 1
+    assert len(np.unique(model.labels_)) == 3
+    assert model.centroids_.shape == (3, 2)
+    assert (model.linkage_ is not None) == model.hierarchical
+
+
+def test_cluster_centroids_are_group_means():
+    X = np.array([[1.0], [3.0], [10.0]])
+    ids, cents = cluster_centroids(X, np.array([2, 2, 1]))
+    assert ids.tolist() == [1, 2]
+    assert cents.ravel().tolist() == [10.0, 2.0]
+
+
+def test_scipy_without_linkage_refuses_uncapped_rows(tmp_path):
+    from fp.cluster import cut_clusters
+
+    with pytest.raises(ValueError, match="full Ward linkage"):
+        cut_clusters(str(tmp_path / "features.csv"), None, ["a"], str(tmp_path / "run"), n_clusters=3, max_rows=None)
+
+
+def test_engines_must_implement_fit_labels():
+    from fp.engines import ClusteringEngine
+
+    class Incomplete(ClusteringEngine):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete(n_clusters=2)
@@ -0,0 +1,31 @@
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from fp.engines import cluster_centroids
+from fp.exemplars import cluster_exemplars
+
+
+def test_exact_medoid_and_exemplar_order():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, 2))
+    labels = np.repeat([1, 2], 30)
+    ids, cents = cluster_centroids(X, labels)
+    user_ids = np.arange(100, 160)
+
+    out = cluster_exemplars(X, user_ids, labels, ids, cents, top_n=3)
+    medoids = out[out["Role"] == "medoid"].set_index("Cluster")["User ID"]
+    brute = np.argmin(cdist(X[:30], X[:30]).sum(axis=1))
+    assert medoids[1] == user_ids[brute]
+
+    ex = out[(out["Role"] == "exemplar") & (out["Cluster"] == 2)]
+    assert ex["Distance To Centroid"].is_monotonic_increasing
+    assert len(ex) == 3
+
+
+def test_sampled_medoid_for_large_clusters():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(500, 3))
+    labels = np.ones(500, dtype=int)
+    ids, cents = cluster_centroids(X, labels)
+    out = cluster_exemplars(X, np.arange(500), labels, ids, cents, medoid_sample=100, medoid_candidates=20)
+    assert out.loc[out["Role"] == "medoid (sampled)", "User ID"].iloc[0] in range(500)
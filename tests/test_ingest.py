@@ -0,0 +1,33 @@
+import pandas as pd
+
+from fp.ingest import expand_paths, read_exports
+
+
+def test_overlapping_exports_keep_first_occurrence(tmp_path):
+    pd.DataFrame({"Order ID": [1, 2, 3, 3], "Value": ["a", "b", "c", "c"]}).to_csv(tmp_path / "orders_01.csv", index=False)
+    pd.DataFrame({"Order ID": [3, 4, None], "Value": ["x", "d", "e"]}).to_csv(tmp_path / "orders_02.csv", index=False)
+
+    paths = expand_paths(["orders_*.csv", "orders_01.csv"], data_dir=str(tmp_path))
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["orders_01.csv", "orders_02.csv"]
+
+    df, stats = read_exports(paths, chunksize=2, max_workers=2)
+    assert df["Value"].tolist() == ["a", "b", "c", "d", "e"]
+    assert stats["rows_read"] == 7
+    assert stats["duplicates_removed"] == 2
+    assert stats["rows"] == 5
+
+
+def test_bounded_window_matches_global_drop_duplicates(tmp_path):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(6):
+        ids = rng.integers(0, 300, 200)
+        pd.DataFrame({"Order ID": ids, "File": i}).to_csv(tmp_path / f"orders_{i}.csv", index=False)
+        paths.append(str(tmp_path / f"orders_{i}.csv"))
+
+    df, stats = read_exports(paths, chunksize=37, max_workers=2)
+    expected = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True).drop_duplicates("Order ID")
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+    assert stats["duplicates_removed"] == 1200 - len(expected)
@@ -0,0 +1,22 @@
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, is_valid_linkage, linkage
+
+from fp.linkage import knn_ward_linkage
+
+
+def test_full_graph_matches_scipy_ward():
+    X = np.random.default_rng(0).normal(size=(60, 3))
+    Z = knn_ward_linkage(X, n_neighbors=59)
+    ref = linkage(X, method="ward")
+    assert np.allclose(Z[:, 2], ref[:, 2])
+    assert np.array_equal(Z[:, 3], ref[:, 3])
+
+
+def test_sparse_graph_gives_valid_monotonic_linkage():
+    rng = np.random.default_rng(1)
+    X = np.vstack([rng.normal(0, 0.1, size=(50, 2)), rng.normal(5, 0.1, size=(50, 2))])
+    Z = knn_ward_linkage(X, n_neighbors=5)
+    assert is_valid_linkage(Z)
+    assert np.all(np.diff(Z[:, 2]) >= 0)
+    labels = fcluster(Z, t=2, criterion="maxclust")
+    assert len(set(labels[:50])) == 1 and len(set(labels[50:])) == 1
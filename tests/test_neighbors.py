@@ -0,0 +1,15 @@
+import numpy as np
+
+from fp.neighbors import NeighborIndex
+
+
+def test_query_excludes_seed_and_respects_cluster():
+    X = np.array([[0.0], [0.1], [0.2], [5.0], [5.1]])
+    idx = NeighborIndex(np.array([10, 11, 12, 13, 14]), np.array([1, 1, 2, 2, 2]), X, ["f"])
+
+    res = idx.query([10], k=2)
+    assert res["User ID"].tolist() == [11, 12]
+    assert res["Rank"].tolist() == [1, 2]
+
+    res = idx.query([10], k=2, cluster=2)
+    assert res["User ID"].tolist() == [12, 13]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from fp.profiles import ClusterProfiler, QuantileSketches, cluster_profiles
+
+
+def test_profiles_match_pandas_and_sketch_accuracy():
+    rng = np.random.default_rng(0)
+    X = np.c_[rng.lognormal(3, 1, 5000), rng.normal(0, 5, 5000)]
+    labels = rng.integers(1, 4, 5000)
+    prof = cluster_profiles(X, labels, ["a", "b"], chunksize=700).set_index(["Cluster", "Feature"])
+
+    df = pd.DataFrame(X, columns=["a", "b"]).assign(Cluster=labels)
+    g = df.groupby("Cluster")
+    for cl in (1, 2, 3):
+        for col in ("a", "b"):
+            row = prof.loc[(cl, col)]
+            assert row["Count"] == (labels == cl).sum()
+            assert np.isclose(row["Mean"], g[col].mean()[cl])
+            assert np.isclose(row["Std"], g[col].std()[cl])
+            assert np.isclose(row["Z"], (g[col].mean()[cl] - df[col].mean()) / df[col].std(ddof=0))
+    # log buckets: relative error within 1% (plus rank granularity on the normal column)
+    med = g["a"].median()
+    assert np.allclose(prof.xs("a", level="Feature")["Median"], med, rtol=0.02)
+
+
+def test_sketches_merge_like_one_pass():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(1000, 2))
+    groups = rng.integers(0, 2, 1000)
+    whole = QuantileSketches(2).add(X, groups)
+    merged = QuantileSketches(2).add(X[:400], groups[:400]).merge(QuantileSketches(2).add(X[400:], groups[400:]))
+    ids = np.array([0, 1])
+    assert np.array_equal(whole.quantiles(ids, [0.1, 0.5, 0.9]), merged.quantiles(ids, [0.1, 0.5, 0.9]))
+
+    a = ClusterProfiler(["x", "y"]).update(X[:400], groups[:400])
+    b = ClusterProfiler(["x", "y"]).update(X[400:], groups[400:])
+    pd.testing.assert_frame_equal(a.merge(b).frame(), ClusterProfiler(["x", "y"]).update(X, groups).frame())
+
+
+def test_profiles_are_stored_in_the_run_dtype():
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(300, 2)).astype(np.float32)
+    labels = rng.integers(1, 3, 300)
+    prof32 = cluster_profiles(X, labels, ["a", "b"], dtype="float32")
+    prof64 = cluster_profiles(X, labels, ["a", "b"])
+    assert prof32["Mean"].dtype == np.float32 and prof64["Mean"].dtype == np.float64
+    assert np.allclose(prof32["Mean"], prof64["Mean"], rtol=1e-6)
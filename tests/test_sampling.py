@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from fp.sampling import load_rows_for_users, sample_features
+
+
+def _features(tmp_path, n=1000):
+    df = pd.DataFrame({
+        "User ID": np.arange(n),
+        "Order Count": np.where(np.arange(n) < 800, 3, 30),
+        "AOV": np.linspace(1, 100, n),
+    })
+    path = tmp_path / "features.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_reservoir_sample_is_seeded_and_spans_file(tmp_path):
+    path = _features(tmp_path)
+    a = sample_features(path, ["User ID", "AOV"], 100, mode="reservoir", seed=1, chunksize=64)
+    b = sample_features(path, ["User ID", "AOV"], 100, mode="reservoir", seed=1, chunksize=64)
+    assert len(a) == 100
+    assert a["User ID"].tolist() == b["User ID"].tolist()
+    assert a["User ID"].max() > 500
+
+
+def test_stratified_sample_keeps_proportions(tmp_path):
+    path = _features(tmp_path)
+    s = sample_features(path, ["User ID"], 100, mode="stratified", stratify_col="Order Count", stratify_bins=[10], chunksize=64)
+    assert list(s.columns) == ["User ID"]
+    assert (s["User ID"] >= 800).sum() == 20
+
+
+def test_load_rows_for_users_keeps_order(tmp_path):
+    path = _features(tmp_path)
+    rows = load_rows_for_users(path, ["User ID", "AOV"], [5, 2, 900], chunksize=64)
+    assert rows["User ID"].tolist() == [5, 2, 900]
+
+
+def test_cluster_cli_passes_stratify_col(tmp_path):
+    import json
+
+    from typer.testing import CliRunner
+
+    from fp.cli import app
+
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "User ID": np.arange(300),
+        "AOV": rng.normal(size=300),
+        "Zone": np.repeat(["a", "b", "c"], 100),
+    }).to_csv(tmp_path / "features.csv", index=False)
+    result = CliRunner().invoke(app, [
+        "cluster", "--features", str(tmp_path / "features.csv"), "--feature-cols", "AOV", "--out-dir", str(tmp_path / "run"),
+        "--engine", "birch", "--n-clusters", "3", "--max-rows", "60", "--sample", "stratified", "--stratify-col", "Zone",
+        "--embedding-dims", "0",
+    ])
+    assert result.exit_code == 0, result.output
+    meta = json.loads((tmp_path / "run" / "run_meta.json").read_text())
+    assert meta["n_users"] == 60 and meta["stratify_col"] == "Zone"
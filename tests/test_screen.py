@@ -0,0 +1,39 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from fp.screen import MomentAccumulator, screen_features, screened_columns
+
+
+def test_streamed_moments_match_numpy():
+    X = np.random.default_rng(0).normal(size=(1000, 4)) * [1.0, 10.0, 0.1, 3.0] + [0.0, 5.0, -2.0, 100.0]
+    acc = MomentAccumulator(4)
+    for start in range(0, 1000, 137):
+        acc.update(X[start:start + 137])
+    assert np.allclose(acc.mean, X.mean(axis=0))
+    assert np.allclose(acc.variance, X.var(axis=0))
+    assert np.allclose(acc.correlation(), np.corrcoef(X, rowvar=False))
+
+
+def test_screen_drops_constant_and_collinear_columns(tmp_path):
+    rng = np.random.default_rng(1)
+    a = rng.normal(size=500)
+    df = pd.DataFrame({
+        "User ID": np.arange(500),
+        "Evening": a * 50 + 50,
+        "Morning": 100 - (a * 50 + 50),
+        "AOV": rng.normal(20, 5, 500),
+        "Flag": np.r_[np.zeros(499), [1e-6]],
+    })
+    df.to_csv(tmp_path / "features.csv", index=False)
+
+    result = screen_features(str(tmp_path / "features.csv"), out_json=str(tmp_path / "screen.json"), chunksize=64)
+    dropped = {d["column"]: d["reason"] for d in result["dropped"]}
+    assert dropped["Flag"] == "near_constant"
+    assert len([c for c in ("Evening", "Morning") if c in dropped]) == 1
+    assert "AOV" in result["suggested_columns"]
+
+    assert screened_columns(tmp_path / "screen.json") == result["suggested_columns"]
+    assert screened_columns(tmp_path / "screen.json", ["AOV", "Flag"]) == ["AOV"]
+    assert json.loads((tmp_path / "screen.json").read_text())["n_rows"] == 500
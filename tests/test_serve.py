@@ -0,0 +1,81 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fp.serve import RunIndex, SegmentService, make_server
+
+
+def _write_run(run_dir):
+    run_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({"User ID": [30, 10, 20], "Cluster": [2, 1, 1]}).to_csv(run_dir / "clustered_users.csv", index=False)
+    pd.DataFrame({"Cluster": [1, 2], "AOV": [10.0, 50.0]}).to_csv(run_dir / "cluster_means.csv", index=False)
+    (run_dir / "run_meta.json").write_text(json.dumps({
+        "feature_cols": ["AOV"],
+        "scaler": {"mean": [20.0], "scale": [10.0]},
+    }))
+    return run_dir
+
+
+def test_run_index_lookup_and_assign(tmp_path):
+    _write_run(tmp_path)
+    idx = RunIndex.load(str(tmp_path))
+    assert idx.lookup([10, 30, 99]).tolist() == [1, 2, -1]
+    assert idx.assign(np.array([[12.0], [45.0]])).tolist() == [1, 2]
+
+
+def test_duplicate_run_names_are_rejected(tmp_path):
+    a = _write_run(tmp_path / "a" / "run")
+    b = _write_run(tmp_path / "b" / "run")
+    with pytest.raises(ValueError, match="Duplicate run name 'run'"):
+        SegmentService([str(a), str(b)])
+
+
+def _post(port, path, payload: bytes):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=payload, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_bad_requests_get_a_response(tmp_path):
+    server = make_server([str(_write_run(tmp_path / "run"))], port=0)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert _post(port, "/assign", b'{"features": [{"AOV": 45.0}]}') == (200, {"run": "run", "clusters": [2]})
+        status, body = _post(port, "/assign", b'{"features": [{"ETA": 1.0}]}')
+        assert status == 400 and "AOV" in body["error"]
+        assert _post(port, "/lookup", b"[1, 2]")[0] == 400
+        assert _post(port, "/lookup", b"{}")[0] == 400
+        assert _post(port, "/lookup", b'{"run": "nope", "user_ids": [1]}')[0] == 404
+
+        for path in ("/x1", "/x2", "/x3"):
+            _post(port, path, b"{}")
+        routes = set(server.service.metrics.snapshot())
+        assert "POST <unknown>" in routes and not any("/x" in r for r in routes)
+
+        server.service.reload = lambda run_dirs=None: 1 / 0
+        status, body = _post(port, "/reload", b"{}")
+        assert status == 500 and body["error"].startswith("ZeroDivisionError")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unscaled_runs_assign_in_raw_space(tmp_path):
+    pd.DataFrame({"User ID": [1, 2], "Cluster": [1, 2]}).to_csv(tmp_path / "clustered_users.csv", index=False)
+    pd.DataFrame({"Cluster": [1, 2], "a": [0.0, 10.0], "b": [10.0, 0.0]}).to_csv(tmp_path / "cluster_means.csv", index=False)
+    meta = {"feature_cols": ["a", "b"], "scaler": {"mean": [5.0, 5.0], "scale": [1.0, 100.0]}}
+    (tmp_path / "run_meta.json").write_text(json.dumps(meta))
+    assert RunIndex.load(str(tmp_path)).assign([[6.0, 9.0]]).tolist() == [2]
+
+    (tmp_path / "run_meta.json").write_text(json.dumps({**meta, "scaled": False}))
+    assert RunIndex.load(str(tmp_path)).assign([[6.0, 9.0]]).tolist() == [1]
@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from fp.cluster import cut_clusters
+from fp.db import save_run_dir
+from fp.stable import match_by_centroids, match_by_overlap, relabel
+
+
+def test_centroid_matching_is_optimal_and_numbers_extra_clusters():
+    ref_ids = np.array([1, 2])
+    ref_means = np.array([[0.0, 0.0], [10.0, 10.0]])
+    new_ids = np.array([1, 2, 3])
+    new_means = np.array([[9.0, 9.5], [50.0, 50.0], [0.5, 0.0]])
+    mapping, dist = match_by_centroids(new_ids, new_means, ref_ids, ref_means, np.ones(2))
+    assert mapping == {1: 2, 2: 3, 3: 1}
+    assert dist[2] is None
+    assert relabel(np.array([3, 1, 2]), {str(k): v for k, v in mapping.items()}).tolist() == [1, 2, 3]
+
+
+def test_overlap_matching_keeps_most_users():
+    mapping, shared = match_by_overlap(
+        np.array([1, 2, 3, 4]), np.array([1, 1, 2, 2]),
+        np.array([1, 2, 3, 5]), np.array([7, 7, 4, 4]),
+    )
+    assert mapping == {1: 7, 2: 4}
+    assert shared == {1: 2, 2: 1}
+
+
+def test_rerun_with_reference_keeps_cluster_ids(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = np.array([[0.0, 0.0], [20.0, 0.0], [0.0, 20.0]])
+    X = np.vstack([c + rng.normal(size=(40, 2)) for c in centers])
+    features = pd.DataFrame({"User ID": np.arange(120), "a": X[:, 0], "b": X[:, 1]})
+    features.to_csv(tmp_path / "features.csv", index=False)
+    shuffled = features.sample(frac=1.0, random_state=1)
+    shuffled.to_csv(tmp_path / "features_shuffled.csv", index=False)
+
+    common = dict(feature_cols=["a", "b"], n_clusters=3, engine="minibatch-kmeans", max_rows=None, embedding_dims=0)
+    cut_clusters(str(tmp_path / "features.csv"), None, out_dir=str(tmp_path / "ref"), seed=0, **common)
+    cut_clusters(
+        str(tmp_path / "features_shuffled.csv"), None, out_dir=str(tmp_path / "new"), seed=5,
+        reference_dir=str(tmp_path / "ref"), **common,
+    )
+
+    ref = pd.read_csv(tmp_path / "ref" / "clustered_users.csv").set_index("User ID")["Cluster"]
+    new = pd.read_csv(tmp_path / "new" / "clustered_users.csv").set_index("User ID")["Cluster"]
+    assert (new.loc[ref.index] == ref).all()
+    meta = json.loads((tmp_path / "new" / "run_meta.json").read_text())
+    assert meta["stable_ids"]["method"] == "centroid"
+
+    db = str(tmp_path / "fp.sqlite")
+    run_id = save_run_dir(db, str(tmp_path / "new"))
+    with sqlite3.connect(db) as con:
+        stored = dict(con.execute("SELECT user_id, cluster_id FROM clusters WHERE run_id = ?", (run_id,)).fetchall())
+    assert all(stored[u] == c for u, c in ref.items())
+
+
+def test_brand_new_clusters_get_fresh_ids():
+    # cluster 2 is far from every reference centroid: no inherited id
+    mapping, dist = match_by_centroids(
+        np.array([1, 2]), np.array([[0.2, 0.0], [40.0, 40.0]]),
+        np.array([1, 2]), np.array([[0.0, 0.0], [10.0, 10.0]]), np.ones(2),
+    )
+    assert mapping == {1: 1, 2: 3}
+    assert dist[2] is None
+
+    # cluster 2 shares no users with reference cluster 5
+    mapping, shared = match_by_overlap(
+        np.array([1, 2, 3, 4]), np.array([1, 1, 2, 2]),
+        np.array([1, 2, 8, 9]), np.array([4, 4, 5, 5]),
+    )
+    assert mapping == {1: 4, 2: 6}
+    assert shared == {1: 2, 2: 0}
@@ -0,0 +1,25 @@
+import numpy as np
+from scipy.cluster.hierarchy import linkage
+
+from fp.tree import build_condensed_tree, dendrogram_frames
+
+
+def test_condensed_tree_means_match_members():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 3))
+    Z = linkage(X, method="ward")
+    tree = build_condensed_tree(Z, X, ["a", "b", "c"])
+
+    # root holds everyone
+    assert tree["sizes"][-1] == 30
+    assert np.allclose(tree["means"][-1], X.mean(axis=0))
+
+
+def test_dendrogram_frames_truncates_to_p_leaves():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(40, 2))
+    tree = build_condensed_tree(linkage(X, method="ward"), X, ["a", "b"])
+    segments, nodes = dendrogram_frames(tree, p=5)
+    assert (nodes["y"] == 0).sum() == 5
+    assert len(segments) == 3 * 4
+    assert nodes["size"][nodes["y"] == 0].sum() == 40
@@ -0,0 +1,9 @@
+import numpy as np
+
+from fp.validate import matched_agreement
+
+
+def test_matched_agreement_ignores_label_names():
+    a = np.array([1, 1, 2, 2, 3])
+    b = np.array([7, 7, 5, 5, 5])
+    assert np.isclose(matched_agreement(a, b), 0.8)
@@ -15,3 +15,28 @@ def test_vendor_concentration_top3_share():
     top3sum = top3["Vendor_Order_Count"].sum()
     conc = (top3sum / total) * 100.0
     assert np.isclose(conc, 90.0)
+
+
+def test_segmented_top_k_matches_rank_based_share():
+    from fp.features import ConcentrationSpec, build_concentration_features
+
+    rng = np.random.default_rng(0)
+    orders = pd.DataFrame({
+        "User ID": rng.integers(1, 40, 2000),
+        "Vendor ID": rng.integers(1, 12, 2000).astype(float),
+        "Provider ID": 1,
+        "Order ID": np.arange(2000),
+    })
+    orders.loc[::17, "Vendor ID"] = np.nan
+
+    voc = orders.groupby(["User ID", "Vendor ID"]).agg(Vendor_Order_Count=("Order ID", "count")).reset_index()
+    voc["Vendor_Rank"] = voc.groupby("User ID")["Vendor_Order_Count"].rank(method="first", ascending=False)
+    top3 = voc[voc["Vendor_Rank"] <= 3].groupby("User ID")["Vendor_Order_Count"].sum()
+    total = orders.groupby("User ID")["Order ID"].count()
+    expected = (top3 / total) * 100.0
+
+    out = build_concentration_features(orders, pd.DataFrame(), [ConcentrationSpec("Vendor", "Vendor ID", top_k=(3,), hhi=True)])
+    out = out.set_index("User ID")
+    assert np.array_equal(out["Vendor Concentration"].to_numpy(), expected.loc[out.index].to_numpy())
+    shares = voc.groupby("User ID")["Vendor_Order_Count"].apply(lambda c: ((c / c.sum()) ** 2).sum())
+    assert np.allclose(out["Vendor HHI"], shares.loc[out.index])
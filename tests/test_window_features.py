@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from fp.features import build_window_features
+
+
+def test_windows_count_orders_before_reference_date():
+    orders = pd.DataFrame({
+        "User ID": [1, 1, 1, 2, 2],
+        "First Order Delivered Time": pd.to_datetime(["2025-06-30", "2025-05-15", "2025-01-01", "2025-06-01", "2025-07-05"]),
+        "Provider Price After Discount": [10.0, 20.0, 30.0, 40.0, 50.0],
+        "Is Refunded (Yes / No)": ["Yes", "No", "No", "No", "No"],
+    })
+    out = build_window_features(orders, pd.Timestamp("2025-07-01"), windows=(30, 90)).set_index("User ID")
+
+    assert out.loc[1, "Orders 30d"] == 1
+    assert out.loc[1, "Orders 90d"] == 2
+    assert np.isclose(out.loc[1, "AOV 90d"], 15.0)
+    assert np.isclose(out.loc[1, "Refund Percentage 90d"], 50.0)
+    # orders after the reference date are ignored
+    assert out.loc[2, "Orders 30d"] == 0
+    assert out.loc[2, "Orders 90d"] == 1
+
+
+def _exports():
+    times = [f"{d} 12:00" for d in ["2025-07-01", "2025-06-01", "2025-05-01", "2025-06-10", "2025-05-10", "2025-04-10", "2025-07-03"]]
+    orders = pd.DataFrame({
+        "User ID": [1, 1, 1, 2, 2, 2, 2],
+        "Order ID": range(7),
+        "Provider ID": 5,
+        "Vendor ID": 50,
+        "Discount Type": "No Discount",
+        "First Order Delivered Time": times,
+        "Courier Picked Up Time": times,
+        "Is Refunded (Yes / No)": "No",
+        "is Order Delayed (Yes / No)": "No",
+        "Is Cash Dropoff (Yes / No)": "No",
+        "Provider Price After Discount": "€10.00",
+        "Average Order Full Time": 30.0,
+        "Estimated Time Minutes": 25.0,
+        "Price Before Discount Eur": 10.0,
+        "Discount Value Eur": 0.0,
+    })
+    zones = pd.DataFrame({"User ID": [1, 2], "Order state": "delivered", "Eater zone": "Tbilisi"})
+    tags = pd.DataFrame({"Provider ID": [5], "Provider Tag": ["Pizza"], "Historical Average Rating": [4.5]})
+    return orders, zones, tags
+
+
+def test_users_ordering_on_the_reference_day_are_kept():
+    from fp.features import build_features_frame
+
+    orders, zones, tags = _exports()
+    out = build_features_frame(orders, zones, tags, excluded_provider_ids=[-1], reference_date="2025-07-01 18:00").set_index("User ID")
+
+    assert out.loc[1, "Months Since Last Order"] == 0
+    # user 2's order after the reference date is left out, not the user
+    assert out.loc[2, "Order Count"] == 3
+    assert out.loc[2, "Months Since Last Order"] == 21 / 30
+
+
+def test_default_reference_date_is_the_latest_order():
+    from fp.features import build_features_frame
+
+    orders, zones, tags = _exports()
+    out = build_features_frame(orders, zones, tags, excluded_provider_ids=[-1], windows=(30,)).set_index("User ID")
+
+    assert out.loc[2, "Months Since Last Order"] == 0
+    assert out.loc[2, "Orders 30d"] == 2
+    assert out.loc[1, "Months Since Last Order"] == 2 / 30
+    assert out.loc[1, "Orders 30d"] == 1
+
+
+def test_date_only_reference_date_covers_the_whole_day():
+    from fp.features import build_features_frame, resolve_reference_date
+
+    assert resolve_reference_date(None, "2025-07-01") == pd.Timestamp("2025-07-01 23:59:59.999999999")
+    assert resolve_reference_date(None, pd.Timestamp("2025-07-01")) == pd.Timestamp("2025-07-01")
+
+    orders, zones, tags = _exports()
+    out = build_features_frame(orders, zones, tags, excluded_provider_ids=[-1], windows=(30,), reference_date="2025-07-01").set_index("User ID")
+
+    # user 1's 12:00 order on the reference day counts
+    assert out.loc[1, "Months Since Last Order"] == 0
+    assert out.loc[1, "Orders 30d"] == 1
+    assert out.loc[2, "Order Count"] == 3
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from fp.features import dominant_zones
+from fp.zones import FULL_WARD_MAX_ROWS, linkage_knn, zone_dirs, zone_slug
+
+
+def test_dominant_zone_is_most_frequent_then_alphabetical():
+    zones = pd.DataFrame({
+        "User ID": [1, 1, 1, 2, 2, 3],
+        "Eater zone": ["Batumi", "Tbilisi", "Tbilisi", "Kutaisi", "Batumi", None],
+    })
+    out = dominant_zones(zones)
+    assert out.to_dict() == {1: "Tbilisi", 2: "Batumi"}
+
+
+def test_zone_slug_is_path_safe():
+    assert zone_slug("Tbilisi / Vake") == "Tbilisi_Vake"
+
+
+def test_colliding_zone_slugs_get_distinct_dirs():
+    dirs = zone_dirs(["Tbilisi / Vake", "Tbilisi_Vake", "tbilisi vake", "Batumi"])
+    assert dirs == {"Batumi": "Batumi", "Tbilisi / Vake": "Tbilisi_Vake", "Tbilisi_Vake": "Tbilisi_Vake_2", "tbilisi vake": "tbilisi_vake_3"}
+
+
+def test_large_uncapped_runs_use_knn_linkage():
+    assert linkage_knn(FULL_WARD_MAX_ROWS, None) is None
+    assert linkage_knn(FULL_WARD_MAX_ROWS + 1, None) is not None
+    assert linkage_knn(10 * FULL_WARD_MAX_ROWS, 40000) is None